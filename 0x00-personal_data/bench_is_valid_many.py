@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of is_valid_many by worker count
+
+Usage: ./bench_is_valid_many.py [pairs] [max_workers] [rounds]
+
+Hashes `pairs` passwords at cost `rounds` (default 10), then verifies
+them, half with the right password, serially with is_valid and with
+is_valid_many on 1, 2, 4, ... up to `max_workers` threads (default: CPU
+count), and prints the verifications per second of each run.
+
+"""
+import os
+import sys
+import time
+
+import bcrypt
+
+from encrypt_password import is_valid, is_valid_many
+
+
+def main() -> None:
+    """ Verify the pairs with each worker count and print the rates """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else \
+        os.cpu_count() or 1
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    pairs, expected = [], []
+    for i in range(count):
+        password = "password{}".format(i)
+        hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds))
+        pairs.append((hashed, password if i % 2 else password + "!"))
+        expected.append(bool(i % 2))
+
+    start = time.perf_counter()
+    assert [is_valid(h, p) for h, p in pairs] == expected
+    print("serial     {:8.1f} verifications/sec".format(
+        count / (time.perf_counter() - start)))
+
+    workers = 1
+    while workers <= max_workers:
+        results = [None] * count
+        start = time.perf_counter()
+        for index, valid in is_valid_many(pairs, workers):
+            results[index] = valid
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        print("{:3} workers {:8.1f} verifications/sec".format(
+            workers, count / elapsed))
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Request-path latency benchmark of the logging pipeline
+
+Usage: ./bench_logging.py [records] [sink_delay_ms]
+
+Logs records to a sink that sleeps `sink_delay_ms` per write, through
+the synchronous handler, through the queue handler with room for every
+record, and through each overflow policy with room for a quarter of
+them. It prints the mean time logger.info takes on the calling
+thread, the total drain time and the number of dropped records.
+
+"""
+import logging
+import os
+import sys
+import time
+
+import filtered_logger
+
+
+class SlowStream():
+    """ Stream sleeping on every write, like a slow log sink """
+
+    def __init__(self, delay: float):
+        """ init """
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        """ write text """
+        time.sleep(self.delay)
+        self.lines += 1
+
+    def flush(self) -> None:
+        """ flush """
+
+
+def run(queued: bool, overflow: str, size: int, count: int,
+        delay: float) -> None:
+    """ Log `count` records and print the timings """
+    os.environ['PERSONAL_DATA_LOG_OVERFLOW'] = overflow
+    os.environ['PERSONAL_DATA_LOG_QUEUE_SIZE'] = str(size)
+    logger = logging.getLogger('user_data')
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+    logger = filtered_logger.get_logger(queued)
+    handler = logger.handlers[0]
+    listener = getattr(handler, 'listener', None)
+    stream = SlowStream(delay)
+    (listener.handlers[0] if listener else handler).setStream(stream)
+
+    start = time.perf_counter()
+    for i in range(count):
+        logger.info("name=user%d; email=user%d@example.com; ip=10.0.0.1;",
+                    i, i)
+    logged = time.perf_counter() - start
+    if listener:
+        listener.stop()
+    drained = time.perf_counter() - start
+    print("{:6} {:11} {:6} {:8.1f} us/record on caller {:7.2f} s to drain "
+          "{:6} dropped".format(
+              "queue" if queued else "sync", overflow if queued else "-",
+              size if queued else "-", logged / count * 1e6, drained,
+              getattr(handler, 'dropped', 0)))
+
+
+def main() -> None:
+    """ Run the synchronous handler and each queue policy """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0005
+    run(False, 'block', 0, count, delay)
+    run(True, 'block', count, count, delay)
+    for overflow in filtered_logger.OVERFLOW_POLICIES:
+        run(True, overflow, count // 4, count, delay)
+
+
+if __name__ == "__main__":
+    main()
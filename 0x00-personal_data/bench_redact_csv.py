@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of redact_csv by worker count
+
+Usage: ./bench_redact_csv.py [rows] [max_workers]
+
+Writes a temporary dump of `rows` records repeated from user_data.csv,
+redacts it with 1, 2, 4, ... up to `max_workers` processes (default: CPU
+count) and prints the rows per second of each run. Every run must
+produce the same output.
+
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from redact_csv import redact_csv
+
+
+def main() -> None:
+    """ Redact the dump with each worker count and print the rates """
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else \
+        os.cpu_count() or 1
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "user_data.csv"), newline="") as f:
+        header, *records = f.readlines()
+    records = [line.rstrip("\r\n") + "\n" for line in records]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path = os.path.join(tmp, "dump.csv")
+        with open(src_path, "w", newline="") as f:
+            f.write(header)
+            for i in range(rows):
+                f.write(records[i % len(records)])
+
+        workers, digests = 1, set()
+        while workers <= max_workers:
+            dst_path = os.path.join(tmp, "redacted.csv")
+            start = time.perf_counter()
+            with open(src_path, newline="") as src, \
+                    open(dst_path, "w", newline="") as dst:
+                count = redact_csv(src, dst, workers=workers)
+            elapsed = time.perf_counter() - start
+            with open(dst_path, "rb") as f:
+                digests.add(hashlib.sha256(f.read()).hexdigest())
+            assert count == rows
+            print("{:3} workers {:10.0f} rows/sec".format(
+                workers, rows / elapsed))
+            workers *= 2
+        assert len(digests) == 1
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark of the PII redaction
+
+Usage: ./bench_redaction.py [records]
+
+Formats log records built from user_data.csv, with and without PII keys,
+through the former filter_datum (pattern rebuilt on every call, Python
+callback per match) and through RedactingFormatter, and prints the
+records per second of each.
+
+"""
+import csv
+import logging
+import os
+import re
+import sys
+import time
+from typing import List
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+
+def legacy_filter_datum(fields: List[str], redaction: str, message: str,
+                        separator: str) -> str:
+    """ filter_datum as it was before the compiled redactor """
+    pattern = r"(\w+)=([a-zA-Z0-9@\.\-\(\)\ \:\^\<\>\~\$\%\@\?\!\/]*)"
+    return re.sub(pattern,
+                  lambda match: match.group(1) + "=" + redaction
+                  if match.group(1) in fields else match.group(0), message)
+
+
+class LegacyFormatter(RedactingFormatter):
+    """ RedactingFormatter calling the former filter_datum """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """ format record """
+        return legacy_filter_datum(self.fields, self.REDACTION,
+                                   logging.Formatter.format(self, record),
+                                   self.SEPARATOR)
+
+
+def build_records(count: int, with_pii: bool) -> List[logging.LogRecord]:
+    """ Returns `count` log records built from user_data.csv """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "user_data.csv")
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    records = []
+    for i in range(count):
+        row = rows[i % len(rows)]
+        if with_pii:
+            message = "; ".join(
+                "{}={}".format(key, value) for key, value in row.items())
+        else:
+            message = "ip={}; last_login={}; user_agent={}".format(
+                row["ip"], row["last_login"], row["user_agent"])
+        records.append(logging.LogRecord("user_data", logging.INFO, None,
+                                         None, message + ";", None, None))
+    return records
+
+
+def main() -> None:
+    """ Time both formatters and print their throughput """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    for with_pii in (True, False):
+        records = build_records(count, with_pii)
+        print("{} records {} PII keys".format(
+            count, "with" if with_pii else "without"))
+        outputs = []
+        for name, formatter in (("legacy", LegacyFormatter(PII_FIELDS)),
+                                ("compiled", RedactingFormatter(PII_FIELDS))):
+            start = time.perf_counter()
+            output = [formatter.format(record) for record in records]
+            elapsed = time.perf_counter() - start
+            outputs.append([line.split(": ", 1)[1] for line in output])
+            print("  {:9} {:10.0f} records/sec".format(
+                name, count / elapsed))
+        assert outputs[0] == outputs[1]
+
+
+if __name__ == "__main__":
+    main()
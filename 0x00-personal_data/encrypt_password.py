@@ -3,17 +3,19 @@
 This module encrypts passwords with bcrypt
 
 """
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import os
+from typing import Iterable, Iterator, Tuple
 import bcrypt
+from password_hasher import get_hasher
 
 
 def hash_password(password: str) -> bytes:
     """
-    Uses bcrypt to hash password
+    Uses bcrypt to hash password, on the shared hasher pool
 
     """
-    salt = bcrypt.gensalt()
-    hashed_pwd = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_pwd
+    return get_hasher().hash(password)
 
 
 def is_valid(hashed_password: bytes, password: str) -> bool:
@@ -21,4 +23,44 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
     Validates matching passwords
 
     """
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    return get_hasher().verify(hashed_password, password)
+
+
+def _check(hashed_password: bytes, password: str) -> bool:
+    """
+    Validates matching passwords, a malformed hash never matching
+
+    """
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+    except ValueError:
+        return False
+
+
+def is_valid_many(pairs: Iterable[Tuple[bytes, str]],
+                  workers: int = None) -> Iterator[Tuple[int, bool]]:
+    """
+    Validates (hashed_password, password) pairs in parallel
+
+    bcrypt releases the GIL, so `workers` threads (default: CPU count)
+    check pairs at once. Yields (index, result) as each check finishes,
+    in completion order; `pairs` is consumed lazily, with at most four
+    checks per worker in flight.
+
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    in_flight = workers * 4
+    pending = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index, (hashed_password, password) in enumerate(pairs):
+            if len(pending) >= in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            future = executor.submit(_check, hashed_password, password)
+            pending[future] = index
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
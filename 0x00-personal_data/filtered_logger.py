@@ -3,14 +3,26 @@
 This module deals with personal data in backend development
 
 """
+import atexit
+import copy
 import os
+import queue
 import re
 import logging
-from typing import List
+import logging.handlers
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterator, List
 import mysql.connector
-from mysql.connector import connection
+from mysql.connector import errors, pooling
 
 PII_FIELDS = ("name", "email", "phone", "ssn", "password")
+VALUE_PATTERN = r"[a-zA-Z0-9@\.\-\(\)\ \:\^\<\>\~\$\%\@\?\!\/]*"
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_oldest")
+_logger_lock = threading.Lock()
+_db_pool = None
+_db_pool_lock = threading.Lock()
 
 
 class RedactingFormatter(logging.Formatter):
@@ -24,79 +36,258 @@ class RedactingFormatter(logging.Formatter):
         """ init """
         super(RedactingFormatter, self).__init__(self.FORMAT)
         self.fields = fields
+        self.redact = redactor(frozenset(fields), self.REDACTION)
 
     def format(self, record: logging.LogRecord) -> str:
-        """ format record """
-        return filter_datum(self.fields, self.REDACTION,
-                            super(RedactingFormatter, self).format(record),
-                            self.SEPARATOR)
+        """ format record, unless it is flagged as already redacted """
+        message = super(RedactingFormatter, self).format(record)
+        if getattr(record, 'redacted', False):
+            return message
+        return self.redact(message)
+
+
+@lru_cache(maxsize=64)
+def redactor(fields: FrozenSet[str],
+             redaction: str) -> Callable[[str], str]:
+    """
+    Returns a function obfuscating the values of `fields` in a message
+
+    The pattern is compiled once per field set. Messages that contain
+    none of the `field=` keys are returned without running it.
+
+    """
+    fields = sorted(field for field in fields if re.fullmatch(r"\w+", field))
+    if not fields:
+        return lambda message: message
+    keys = tuple(field + "=" for field in fields)
+    pattern = re.compile(
+        r"(?<!\w)({})={}".format("|".join(fields), VALUE_PATTERN))
+    replacement = r"\g<1>=" + redaction.replace("\\", r"\\")
+    sub = pattern.sub
+
+    def redact(message: str) -> str:
+        """ returns the message obfuscated """
+        for key in keys:
+            if key in message:
+                return sub(replacement, message)
+        return message
+    return redact
 
 
 def filter_datum(fields: List[str], redaction: str, message: str,
                  separator: str) -> str:
     """ returns the log message obfuscated """
-    pattern = r"(\w+)=([a-zA-Z0-9@\.\-\(\)\ \:\^\<\>\~\$\%\@\?\!\/]*)"
-    return re.sub(pattern,
-                  lambda match: match.group(1) + "=" + redaction
-                  if match.group(1) in fields else match.group(0), message)
+    return redactor(frozenset(fields), redaction)(message)
+
+
+class RedactingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler with a bounded queue and an overflow policy
 
+    Records are only snapshotted on the calling thread; formatting,
+    redaction and the write happen on the QueueListener thread.
+    `overflow` is one of OVERFLOW_POLICIES: "block" waits for room,
+    "drop_new" discards the incoming record and "drop_oldest" discards
+    the oldest queued one. Discarded records are counted in `dropped`.
 
-def get_logger() -> logging.Logger:
+    """
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = "block"):
+        """ init """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of {}".format(
+                ", ".join(OVERFLOW_POLICIES)))
+        super(RedactingQueueHandler, self).__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+        self.listener = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """ snapshot record without formatting it """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """ queue record according to the overflow policy """
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                if self.overflow == "drop_new":
+                    self.dropped += 1
+                    return
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+
+class RedactingQueueListener(logging.handlers.QueueListener):
+    """ Queue listener that can be stopped more than once and waits for
+    room to queue its stop sentinel """
+
+    def stop(self) -> None:
+        """ drain the queue and stop the listener thread """
+        if self._thread is not None:
+            super(RedactingQueueListener, self).stop()
+
+    def enqueue_sentinel(self) -> None:
+        """ queue the stop sentinel, even when the queue is full """
+        self.queue.put(self._sentinel)
+
+
+def get_logger(queued: bool = None) -> logging.Logger:
     """
     Creates and configures the logger
 
+    With `queued` (default: PERSONAL_DATA_LOG_QUEUE=1), records go through
+    a RedactingQueueHandler of PERSONAL_DATA_LOG_QUEUE_SIZE records and
+    PERSONAL_DATA_LOG_OVERFLOW policy, and are redacted and written by a
+    background QueueListener. The logger is only configured once; later
+    calls return it unchanged.
+
     """
     logger = logging.getLogger('user_data')
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+    with _logger_lock:
+        if logger.handlers:
+            return logger
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+        s_handler = logging.StreamHandler()
+        s_formatter = RedactingFormatter(PII_FIELDS)
+        s_handler.setFormatter(s_formatter)
+
+        if queued is None:
+            queued = os.getenv('PERSONAL_DATA_LOG_QUEUE') == '1'
+        if not queued:
+            logger.addHandler(s_handler)
+            return logger
 
-    s_handler = logging.StreamHandler()
-    s_formatter = RedactingFormatter(PII_FIELDS)
-    s_handler.setFormatter(s_formatter)
+        try:
+            size = int(os.getenv('PERSONAL_DATA_LOG_QUEUE_SIZE', 10000))
+        except ValueError:
+            size = 10000
+        q_handler = RedactingQueueHandler(
+            queue.Queue(size),
+            os.getenv('PERSONAL_DATA_LOG_OVERFLOW', 'block'))
+        q_handler.listener = RedactingQueueListener(
+            q_handler.queue, s_handler, respect_handler_level=True)
+        q_handler.listener.start()
+        atexit.register(q_handler.listener.stop)
 
-    logger.addHandler(s_handler)
+        logger.addHandler(q_handler)
     return logger
 
 
-def get_db() -> connection.MySQLConnection:
+def get_db_pool() -> pooling.MySQLConnectionPool:
+    """
+    Returns the process-wide connection pool, creating it on first use
+
+    The pool holds PERSONAL_DATA_DB_POOL_SIZE connections (default 5, at
+    most 32) to PERSONAL_DATA_DB_HOST:PERSONAL_DATA_DB_PORT.
+
+    """
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            try:
+                size = int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', 5))
+                port = int(os.getenv('PERSONAL_DATA_DB_PORT', 3306))
+            except ValueError:
+                size, port = 5, 3306
+            _db_pool = pooling.MySQLConnectionPool(
+                pool_name='personal_data',
+                pool_size=max(1, min(size, pooling.CNX_POOL_MAXSIZE)),
+                user=os.getenv('PERSONAL_DATA_DB_USERNAME'),
+                password=os.getenv('PERSONAL_DATA_DB_PASSWORD'),
+                host=os.getenv('PERSONAL_DATA_DB_HOST', 'localhost'),
+                port=port,
+                database=os.getenv('PERSONAL_DATA_DB_NAME')
+            )
+    return _db_pool
+
+
+def get_db() -> pooling.PooledMySQLConnection:
     """
     Returns a connector to the database
 
+    The connection comes from get_db_pool(), which pings it on checkout
+    and reconnects it if it went stale; close() hands it back to the
+    pool. When every connection is in use, waits up to
+    PERSONAL_DATA_DB_POOL_TIMEOUT seconds (default 5) for one.
+
     """
-    username = os.getenv('PERSONAL_DATA_DB_USERNAME'),
-    password = os.getenv('PERSONAL_DATA_DB_PASSWORD'),
-    host = os.getenv('PERSONAL_DATA_DB_HOST', 'localhost'),
-    db_name = os.getenv('PERSONAL_DATA_DB_NAME')
+    pool = get_db_pool()
+    try:
+        timeout = float(os.getenv('PERSONAL_DATA_DB_POOL_TIMEOUT', 5))
+    except ValueError:
+        timeout = 5
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            return pool.get_connection()
+        except errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
 
-    db_connector = mysql.connector.connect(
-        user=username,
-        password=password,
-        host=host,
-        database=db_name
-    )
-    return db_connector
+
+def iter_redacted_rows(cursor, fields: List[str] = PII_FIELDS,
+                       redaction: str = RedactingFormatter.REDACTION,
+                       batch_size: int = 1000) -> Iterator[str]:
+    """
+    Yields a redacted `key=value; ...;` line per row of an executed cursor
+
+    Rows are fetched `batch_size` at a time, and which columns to redact
+    is decided once from `cursor.description`, so memory stays constant
+    whatever the size of the result.
+
+    """
+    fields = frozenset(fields)
+    columns = [(col[0] + "=", col[0] in fields) for col in cursor.description]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield "; ".join(
+                [key + redaction if redact else key + str(value)
+                 for (key, redact), value in zip(columns, row)]) + ";"
 
 
 def main() -> None:
     """
     Obtain db connection and display data
 
+    Rows are streamed from an unbuffered cursor in batches of
+    PERSONAL_DATA_FETCH_SIZE (default 1000) and logged already redacted.
+
     """
+    try:
+        batch_size = int(os.getenv('PERSONAL_DATA_FETCH_SIZE', 1000))
+    except ValueError:
+        batch_size = 1000
     logger = get_logger()
     db_conn = get_db()
-    cursor = db_conn.cursor
-    cursor.execute('SELECT * from users;')
-    rows = cursor.fetchall()
-
-    columns = [col[0] for col in cursor.description]
-    for row in rows:
-        row_data = dict(zip(columns, row))
-        log_message = "; ".join(
-            [f"{key}={value}" for key, value in row_data.items()]) + ";"
-        logger.info(log_message)
-
-    cursor.close()
-    db_conn.close()
+    cursor = db_conn.cursor(buffered=False)
+    try:
+        cursor.execute('SELECT * from users;')
+        for log_message in iter_redacted_rows(cursor,
+                                              batch_size=batch_size):
+            logger.info(log_message, extra={'redacted': True})
+    finally:
+        cursor.close()
+        db_conn.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Password hasher module
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import re
+import threading
+import time
+from typing import Iterable, List
+import bcrypt
+
+MIN_ROUNDS = 4
+MAX_ROUNDS = 31
+_COST = re.compile(rb"^\$2[abxy]?\$(\d\d)\$")
+
+
+class PasswordHasher:
+    """Shared bcrypt hasher running on a bounded thread pool
+
+    bcrypt releases the GIL, so `workers` threads hash in parallel while
+    the calling threads wait; at most `max_pending` hashes are queued or
+    running, and callers beyond that block until one finishes.
+
+    The cost is PASSWORD_HASH_ROUNDS when set, otherwise the highest one
+    that hashes within PASSWORD_HASH_TARGET_MS (default 250) on this
+    host, and never below PASSWORD_HASH_MIN_ROUNDS (default 12).
+    """
+
+    def __init__(self, rounds: int = None, workers: int = None,
+                 max_pending: int = None) -> None:
+        """Initialize the pool and calibrate the cost if needed
+        """
+        if workers is None:
+            workers = int(os.getenv("PASSWORD_HASH_WORKERS",
+                                    os.cpu_count() or 1))
+        if max_pending is None:
+            max_pending = int(os.getenv("PASSWORD_HASH_MAX_PENDING",
+                                        workers * 4))
+        if rounds is None and os.getenv("PASSWORD_HASH_ROUNDS"):
+            rounds = int(os.getenv("PASSWORD_HASH_ROUNDS"))
+        if rounds is None:
+            rounds = self.calibrate(
+                float(os.getenv("PASSWORD_HASH_TARGET_MS", 250)),
+                int(os.getenv("PASSWORD_HASH_MIN_ROUNDS", 12)))
+        self.rounds = max(MIN_ROUNDS, min(rounds, MAX_ROUNDS))
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="hasher")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    @staticmethod
+    def calibrate(target_ms: float, min_rounds: int = 12) -> int:
+        """Return the highest cost hashing within `target_ms`, at least
+        `min_rounds`
+        """
+        probe = 8
+        salt = bcrypt.gensalt(probe)
+        elapsed = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            bcrypt.hashpw(b"calibration", salt)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        rounds = probe
+        while rounds < MAX_ROUNDS and \
+                elapsed * 1000 * 2 ** (rounds + 1 - probe) <= target_ms:
+            rounds += 1
+        return max(rounds, min_rounds)
+
+    def submit(self, fn, *args) -> Future:
+        """Run fn(*args) on the pool once a pending slot is free
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> bytes:
+        """Hash password at the current cost
+        """
+        salt = bcrypt.gensalt(self.rounds)
+        return self.submit(bcrypt.hashpw, password.encode("utf-8"),
+                           salt).result()
+
+    def hash_many(self, passwords: Iterable[str]) -> List[bytes]:
+        """Hash several passwords in parallel, in order
+        """
+        futures = [self.submit(bcrypt.hashpw, password.encode("utf-8"),
+                               bcrypt.gensalt(self.rounds))
+                   for password in passwords]
+        return [future.result() for future in futures]
+
+    def verify(self, hashed_password: bytes, password: str) -> bool:
+        """Check password against a bcrypt hash
+        """
+        return self.submit(bcrypt.checkpw, password.encode("utf-8"),
+                           hashed_password).result()
+
+    def needs_rehash(self, hashed_password: bytes) -> bool:
+        """Tell whether a hash was made at a lower cost than the current
+
+        A higher stored cost is kept, so hosts calibrating to different
+        costs do not keep rehashing each other's hashes.
+        """
+        match = _COST.match(hashed_password)
+        return match is None or int(match.group(1)) < self.rounds
+
+    def shutdown(self) -> None:
+        """Stop the pool once the queued hashes are done
+        """
+        self._executor.shutdown(wait=True)
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+    """Return the process-wide hasher, calibrating it on first use
+    """
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = PasswordHasher()
+    return _hasher
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+This module redacts the PII columns of CSV dumps like user_data.csv
+
+Usage: ./redact_csv.py [-w WORKERS] [-c CHUNK_SIZE] input.csv [output.csv]
+
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Iterator, List, Tuple
+
+from filtered_logger import PII_FIELDS, RedactingFormatter
+
+CHUNK_SIZE = 5000
+
+
+def iter_chunks(lines: IO[str], chunk_size: int) -> Iterator[str]:
+    """
+    Yields the text of `chunk_size` CSV records at a time
+
+    A record ends on a line that leaves an even number of quotes open,
+    so quoted fields spanning several lines stay in one chunk.
+
+    """
+    chunk, count, quotes = [], 0, 0
+    for line in lines:
+        chunk.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        quotes = 0
+        count += 1
+        if count == chunk_size:
+            yield "".join(chunk)
+            chunk, count = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+
+def redact_chunk(job: Tuple[Tuple[int, ...], str, str]) -> Tuple[int, str]:
+    """
+    Returns the record count and the CSV text of a chunk with the given
+    columns redacted
+
+    """
+    indexes, redaction, text = job
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    count = 0
+    for row in csv.reader(io.StringIO(text, newline="")):
+        for i in indexes:
+            if i < len(row):
+                row[i] = redaction
+        writer.writerow(row)
+        count += 1
+    return count, out.getvalue()
+
+
+def redact_csv(src: IO[str], dst: IO[str], fields: List[str] = PII_FIELDS,
+               redaction: str = RedactingFormatter.REDACTION,
+               workers: int = None, chunk_size: int = CHUNK_SIZE) -> int:
+    """
+    Copies the CSV `src` to `dst` with the `fields` columns redacted
+
+    The header decides which column indexes to redact. The records are
+    read in chunks of `chunk_size`, redacted across a pool of `workers`
+    processes (in this process when `workers` is 1) and written in their
+    original order, with at most two chunks per worker in flight.
+    Returns the number of records written.
+
+    """
+    header = next(csv.reader([src.readline()]), None)
+    if header is None:
+        return 0
+    fields = frozenset(fields)
+    indexes = tuple(i for i, name in enumerate(header) if name in fields)
+    csv.writer(dst, lineterminator="\n").writerow(header)
+    jobs = ((indexes, redaction, text)
+            for text in iter_chunks(src, chunk_size))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        return _write(dst, map(redact_chunk, jobs))
+
+    with ProcessPoolExecutor(workers) as executor:
+        return _write(dst, _in_order(executor, jobs, workers * 2))
+
+
+def _in_order(executor: ProcessPoolExecutor, jobs: Iterator,
+              in_flight: int) -> Iterator[Tuple[int, str]]:
+    """
+    Yields the results of `jobs` in order, submitting no more than
+    `in_flight` ahead of the one being waited on
+
+    """
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(redact_chunk, job))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _write(dst: IO[str], results: Iterator[Tuple[int, str]]) -> int:
+    """
+    Writes the redacted chunks to `dst` and returns their record count
+
+    """
+    total = 0
+    for count, text in results:
+        dst.write(text)
+        total += count
+    return total
+
+
+def main() -> None:
+    """
+    Redact a CSV file from the command line
+
+    """
+    parser = argparse.ArgumentParser(
+        description="Redact the PII columns ({}) of a CSV file".format(
+            ", ".join(PII_FIELDS)))
+    parser.add_argument("input", help="CSV file to redact, - for stdin")
+    parser.add_argument("output", nargs="?", default="-",
+                        help="redacted CSV file, - for stdout (default)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="records per chunk (default: %(default)s)")
+    args = parser.parse_args()
+
+    src = sys.stdin if args.input == "-" else \
+        open(args.input, newline="")
+    dst = sys.stdout if args.output == "-" else \
+        open(args.output, "w", newline="")
+    try:
+        redact_csv(src, dst, workers=args.workers,
+                   chunk_size=args.chunk_size)
+    finally:
+        for f in (src, dst):
+            if f not in (sys.stdin, sys.stdout):
+                f.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,9 @@ app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+EXCLUDED_PATHS = ('/api/v1/status/',
+                  '/api/v1/unauthorized/',
+                  '/api/v1/forbidden/')
 
 if os.getenv('AUTH_TYPE') == 'auth':
     auth = Auth()
@@ -49,10 +52,7 @@ def before_request():
     """
     if auth is None:
         return None
-    excluded_paths = ['/api/v1/status/',
-                      '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/']
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return None
     if auth.authorization_header(request) is None:
         abort(401)
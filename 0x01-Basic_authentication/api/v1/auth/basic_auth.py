@@ -4,15 +4,30 @@ This module deals with basic authentication.
 """
 
 import base64
+import hashlib
+import hmac
+import os
+import secrets
 from typing import Optional, Tuple
 from api.v1.auth.auth import Auth
+from models.cache import TTLCache
 from models.user import User
 
 
 class BasicAuth(Auth):
     """
     BasicAuth class for handling Basic Authentication.
+
+    Verified credentials are cached by a keyed hash of the raw
+    Authorization header, so repeated requests with the same header skip
+    the decode, the user search and the password hash. A cached entry is
+    only used while the user still exists with the same email and
+    password hash.
     """
+    credentials_cache = TTLCache(
+        maxsize=int(os.getenv('BASIC_AUTH_CACHE_SIZE', 10000)),
+        ttl=float(os.getenv('BASIC_AUTH_CACHE_TTL', 300)))
+    _cache_key = secrets.token_bytes(32)
 
     def extract_base64_authorization_header(
             self, authorization_header: str) -> Optional[str]:
@@ -127,6 +142,18 @@ class BasicAuth(Auth):
         if authorization_header is None:
             return None
 
+        cache_key = hmac.new(self._cache_key,
+                             authorization_header.encode('utf-8'),
+                             hashlib.sha256).digest()
+        cached = self.credentials_cache.get(cache_key)
+        if cached is not None:
+            user_id, user_email, user_password = cached
+            user = User.get(user_id)
+            if user is not None and user.email == user_email and \
+                    user.password == user_password:
+                return user
+            self.credentials_cache.pop(cache_key)
+
         base64_authorization_header = self.extract_base64_authorization_header(
             authorization_header)
         if base64_authorization_header is None:
@@ -142,4 +169,8 @@ class BasicAuth(Auth):
         if user_email is None or user_pwd is None:
             return None
 
-        return self.user_object_from_credentials(user_email, user_pwd)
+        user = self.user_object_from_credentials(user_email, user_pwd)
+        if user is not None:
+            self.credentials_cache.set(
+                cache_key, (user.id, user.email, user.password))
+        return user
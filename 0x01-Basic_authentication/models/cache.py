@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+""" Cache module
+"""
+from collections import OrderedDict
+from typing import Hashable
+import threading
+import time
+
+
+class TTLCache():
+    """ Bounded, thread-safe LRU cache whose entries expire after `ttl`
+    seconds
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """ Initialize an empty cache
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        """ Return the live value of `key`, or `default`
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value) -> None:
+        """ Store `value` under `key`, evicting the least recently used
+        entry when full
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default=None):
+        """ Remove `key` and return its value, or `default`
+        """
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """ Remove every entry
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """ Return the size and hit/miss counters of the cache
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        """ Number of entries, expired ones included
+        """
+        return len(self._data)
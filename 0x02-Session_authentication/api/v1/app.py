@@ -13,6 +13,10 @@ app = Flask(__name__)
 app.register_blueprint(app_views)
 CORS(app, resources={r"/api/v1/*": {"origins": "*"}})
 auth = None
+EXCLUDED_PATHS = ('/api/v1/status/',
+                  '/api/v1/unauthorized/',
+                  '/api/v1/forbidden/',
+                  '/api/v1/auth_session/login/')
 
 if os.getenv('AUTH_TYPE') == 'auth':
     from api.v1.auth.auth import Auth
@@ -58,17 +62,13 @@ def before_request():
     """
     if auth is None:
         return None
-    excluded_paths = ['/api/v1/status/',
-                      '/api/v1/unauthorized/',
-                      '/api/v1/forbidden/',
-                      '/api/v1/auth_session/login/']
-    if not auth.require_auth(request.path, excluded_paths):
+    if not auth.require_auth(request.path, EXCLUDED_PATHS):
         return None
     if (auth.authorization_header(request) is None and
             auth.session_cookie(request) is None):
         abort(401)
     request.current_user = auth.current_user(request)
-    if auth.current_user(request) is None:
+    if request.current_user is None:
         abort(403)
 
 
@@ -4,15 +4,102 @@ This module deals with user authentication
 
 """
 from flask import request
-from typing import List, TypeVar
+from functools import lru_cache, wraps
+from typing import Callable, List, Sequence, Tuple, TypeVar
 import os
 
 
+def memoize_current_user(current_user: Callable) -> Callable:
+    """
+    Wraps a current_user method so that it runs once per request: the
+    result is stored on the request object and returned by later calls
+    made by the same Auth instance
+
+    """
+    @wraps(current_user)
+    def wrapper(self, request=None):
+        if request is None:
+            return current_user(self, request)
+        memo = getattr(request, '_current_user_memo', None)
+        if memo is not None and memo[0] is self:
+            return memo[1]
+        user = current_user(self, request)
+        try:
+            request._current_user_memo = (self, user)
+        except AttributeError:
+            pass
+        return user
+    return wrapper
+
+
+class PathMatcher():
+    """
+    Excluded paths compiled into a set of exact paths and a character
+    trie of wildcard prefixes (entries ending with '*')
+
+    """
+    def __init__(self, excluded_paths: Sequence[str]):
+        """
+        Compile `excluded_paths`
+
+        """
+        self.exact = set()
+        self.prefixes = {}
+        for excluded_path in excluded_paths:
+            if not excluded_path.endswith('*'):
+                self.exact.add(excluded_path)
+                continue
+            node = self.prefixes
+            for char in excluded_path[:-1]:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+    def match(self, path: str) -> bool:
+        """
+        Checks if path is excluded, in O(len(path))
+
+        """
+        if path in self.exact:
+            return True
+        node = self.prefixes
+        if '' in node:
+            return True
+        for char in path:
+            node = node.get(char)
+            if node is None:
+                return False
+            if '' in node:
+                return True
+        return False
+
+
+@lru_cache(maxsize=64)
+def compile_paths(excluded_paths: Tuple[str, ...]) -> PathMatcher:
+    """
+    Returns the compiled matcher of excluded_paths, keeping the 64 most
+    recently used ones
+
+    """
+    return PathMatcher(excluded_paths)
+
+
 class Auth():
     """
     Defines methods used during authentication
 
+    current_user is resolved once per request: subclasses overriding it
+    get it wrapped by memoize_current_user automatically.
+
     """
+    def __init_subclass__(cls, **kwargs):
+        """
+        Memoizes the current_user method of subclasses
+
+        """
+        super().__init_subclass__(**kwargs)
+        if 'current_user' in cls.__dict__:
+            cls.current_user = memoize_current_user(cls.current_user)
+
     def require_auth(self, path: str, excluded_paths: List[str]) -> bool:
         """
         Checks if path requires authentication
@@ -24,13 +111,15 @@ class Auth():
             return True
         if not path.endswith("/"):
             path += "/"
-        for excluded_path in excluded_paths:
-            if excluded_path.endswith('*'):
-                if path.startswith(excluded_path[:-1]):
-                    return False
-            elif excluded_path == path:
-                return False
-        return True
+        return not self.path_matcher(excluded_paths).match(path)
+
+    def path_matcher(self, excluded_paths: Sequence[str]) -> PathMatcher:
+        """
+        Returns the compiled matcher of the current excluded_paths,
+        compiling it on first use
+
+        """
+        return compile_paths(tuple(excluded_paths))
 
     def authorization_header(self, request=None) -> str:
         """
@@ -5,7 +5,12 @@ This module authenticates with session IDs stored in the db
 """
 
 from datetime import datetime, timedelta
+import heapq
+import os
+import time
+import uuid
 from api.v1.auth.session_exp_auth import SessionExpAuth
+from models.cache import TTLCache
 from models.user_session import UserSession
 
 
@@ -13,20 +18,56 @@ class SessionDBAuth(SessionExpAuth):
     """
     Handles session authentication with db storage
 
+    `session_cache` serves as a hot read cache in front of the
+    `UserSession` store: sessions are written through to both, and a
+    lookup only reaches the store (by its session_id index) on a miss.
+    The cache holds at most `SESSION_CACHE_SIZE` entries for
+    `SESSION_CACHE_TTL` seconds (default 5), which bounds how long a
+    session destroyed by another worker keeps authenticating here.
+    Sessions looked up here are scheduled once on the expiry heap, which
+    evicts them from the cache when they expire. Expired rows are read
+    oldest first from the `created_at` index and removed one batch of
+    `SESSION_PURGE_BATCH` at a time, every `SESSION_PURGE_INTERVAL`
+    seconds or as soon as a batch worth of sessions expired here; while
+    a batch comes back full, the next lookup removes the next one.
+
     """
+    session_counters = {'expired': 0, 'pending': 0, 'purged': 0,
+                        'last_purge': 0.0}
+    session_cache = TTLCache(
+        maxsize=int(os.getenv('SESSION_CACHE_SIZE', 10000)),
+        ttl=float(os.getenv('SESSION_CACHE_TTL', 5)))
+    scheduled_sessions = set()
+
+    def __init__(self):
+        """
+        Read the purge settings and load the session store
+
+        """
+        super().__init__()
+        try:
+            self.purge_batch = int(os.getenv('SESSION_PURGE_BATCH', 1000))
+            self.purge_interval = float(
+                os.getenv('SESSION_PURGE_INTERVAL', 60))
+        except ValueError:
+            self.purge_batch, self.purge_interval = 1000, 60
+        self.session_counters['last_purge'] = time.monotonic()
+        UserSession.load_from_file()
 
     def create_session(self, user_id=None):
         """
         Create a session ID and store it in the database.
 
         """
-        session_id = super().create_session(user_id)
-        if session_id is None:
+        if user_id is None or not isinstance(user_id, str):
             return None
 
-        user_session = UserSession(user_id=user_id, session_id=session_id)
+        user_session = UserSession(user_id=user_id,
+                                   session_id=str(uuid.uuid4()))
         user_session.save()
-        return session_id
+        self._cache_session(user_session)
+        self.reap_expired_sessions()
+        return user_session.session_id
 
     def user_id_for_session_id(self, session_id=None):
         """
@@ -36,17 +77,20 @@ class SessionDBAuth(SessionExpAuth):
         if session_id is None:
             return None
 
-        user_sessions = UserSession.search({"session_id": session_id})
-        if not user_sessions:
-            return None
-
-        user_session = user_sessions[0]
-
-        if user_session.created_at + timedelta(seconds=self.session_duration) \
-                < datetime.now():
+        self.reap_expired_sessions()
+        session_dict = self.session_cache.get(session_id)
+        if session_dict is None:
+            user_session = self._find_user_session(session_id)
+            if user_session is None:
+                return None
+            session_dict = self._cache_session(user_session)
+
+        if self.session_duration > 0 and \
+                session_dict['created_at'] + \
+                timedelta(seconds=self.session_duration) < self._now():
             return None
 
-        return user_session.user_id
+        return session_dict['user_id']
 
     def destroy_session(self, request=None):
         """
@@ -60,10 +104,113 @@ class SessionDBAuth(SessionExpAuth):
         if session_id is None:
             return False
 
-        user_sessions = UserSession.search({"session_id": session_id})
-        if not user_sessions:
+        self.session_cache.pop(session_id, None)
+        user_session = self._find_user_session(session_id)
+        if user_session is None:
             return False
 
-        user_session = user_sessions[0]
         user_session.remove()
         return True
+
+    def reap_expired_sessions(self, now: datetime = None) -> int:
+        """
+        Evict expired sessions from the cache, and purge the expired rows
+        when a batch is due
+
+        """
+        if now is None:
+            now = self._now()
+        session_ids = self._pop_expired_sessions(now)
+        for session_id in session_ids:
+            self.session_cache.pop(session_id, None)
+        counters = self.session_counters
+        with self._reaper_lock:
+            self.scheduled_sessions.difference_update(session_ids)
+            counters['expired'] += len(session_ids)
+            counters['pending'] += len(session_ids)
+            due = self.session_duration > 0 and \
+                (counters['pending'] >= self.purge_batch or
+                 time.monotonic() - counters['last_purge']
+                 >= self.purge_interval)
+            if due:
+                counters['pending'] = 0
+                counters['last_purge'] = time.monotonic()
+        if due and self.purge_expired_sessions(now) >= self.purge_batch:
+            with self._reaper_lock:
+                counters['last_purge'] = float('-inf')
+        return len(session_ids)
+
+    def purge_expired_sessions(self, now: datetime = None) -> int:
+        """
+        Remove one batch of the oldest expired UserSession rows, in one
+        write
+
+        Returns the number of rows removed: a full batch means more may
+        be left.
+
+        """
+        if now is None:
+            now = self._now()
+        if self.session_duration <= 0:
+            return 0
+
+        cutoff = now - timedelta(seconds=self.session_duration)
+        expired = UserSession.search_before('created_at', cutoff,
+                                            self.purge_batch)
+        purged = UserSession.bulk_remove(expired) if expired else 0
+        with self._reaper_lock:
+            self.session_counters['purged'] += purged
+        return purged
+
+    def session_metrics(self) -> dict:
+        """
+        Return the stored, expired and cached session counts
+
+        """
+        self.reap_expired_sessions()
+        return {
+            'live': UserSession.count(),
+            'expired': self.session_counters['expired'],
+            'purged': self.session_counters['purged'],
+            'cached': len(self.session_cache),
+        }
+
+    def _cache_session(self, user_session: UserSession) -> dict:
+        """
+        Cache a stored session and schedule its expiry, once
+
+        """
+        session_dict = {
+            'user_id': user_session.user_id,
+            'created_at': user_session.created_at
+        }
+        session_id = user_session.session_id
+        self.session_cache.set(session_id, session_dict)
+        if self.session_duration <= 0:
+            return session_dict
+        with self._reaper_lock:
+            if session_id not in self.scheduled_sessions:
+                self.scheduled_sessions.add(session_id)
+                heapq.heappush(self.session_expiry_heap, (
+                    session_dict['created_at'] +
+                    timedelta(seconds=self.session_duration),
+                    session_id))
+        return session_dict
+
+    def _now(self) -> datetime:
+        """
+        Current time, in UTC like the UserSession timestamps
+
+        """
+        return datetime.utcnow()
+
+    @staticmethod
+    def _find_user_session(session_id: str) -> UserSession:
+        """
+        Return the stored UserSession of `session_id`, or None
+
+        """
+        user_sessions = UserSession.search({"session_id": session_id})
+        if not user_sessions:
+            return None
+        return user_sessions[0]
@@ -5,7 +5,10 @@ Module for Session Authentication with expiration
 """
 
 from datetime import datetime, timedelta
+import heapq
 import os
+import threading
+from typing import List
 from api.v1.auth.session_auth import SessionAuth
 
 
@@ -13,7 +16,16 @@ class SessionExpAuth(SessionAuth):
     """
     SessionExpAuth class for handling Session Authentication with expiration
 
+    Next to `user_id_by_session_id`, `session_expiry_heap` keeps
+    (expires_at, session_id) pairs ordered by expiry. Every session
+    lookup and creation first pops the expired head of the heap and
+    deletes those sessions, so expired entries are evicted in
+    O(expired * log n) instead of staying in memory forever.
+
     """
+    session_expiry_heap = []
+    session_counters = {'expired': 0}
+    _reaper_lock = threading.Lock()
 
     def __init__(self):
         """
@@ -37,9 +49,16 @@ class SessionExpAuth(SessionAuth):
 
         session_dict = {
             'user_id': user_id,
-            'created_at': datetime.now()
+            'created_at': self._now()
         }
         self.user_id_by_session_id[session_id] = session_dict
+        if self.session_duration > 0:
+            expires_at = session_dict['created_at'] + \
+                timedelta(seconds=self.session_duration)
+            with self._reaper_lock:
+                heapq.heappush(self.session_expiry_heap,
+                               (expires_at, session_id))
+        self.reap_expired_sessions()
 
         return session_id
 
@@ -51,6 +70,7 @@ class SessionExpAuth(SessionAuth):
         if session_id is None:
             return None
 
+        self.reap_expired_sessions()
         session_dict = self.user_id_by_session_id.get(session_id)
         if session_dict is None:
             return None
@@ -63,7 +83,56 @@ class SessionExpAuth(SessionAuth):
             return None
 
         if created_at + timedelta(seconds=self.session_duration) < \
-                datetime.now():
+                self._now():
             return None
 
         return session_dict.get('user_id')
+
+    def reap_expired_sessions(self, now: datetime = None) -> int:
+        """
+        Delete the sessions whose expiry time has passed
+
+        Returns the number of expired heap entries popped.
+
+        """
+        return len(self._pop_expired_sessions(now))
+
+    def _pop_expired_sessions(self, now: datetime = None) -> List[str]:
+        """
+        Pop the expired head of the expiry heap, delete those sessions
+        and return the popped session IDs
+
+        """
+        heap = self.session_expiry_heap
+        if now is None:
+            now = self._now()
+        if not heap or heap[0][0] >= now:
+            return []
+
+        session_ids = []
+        with self._reaper_lock:
+            while heap and heap[0][0] < now:
+                expires_at, session_id = heapq.heappop(heap)
+                if self.user_id_by_session_id.pop(session_id, None) \
+                        is not None:
+                    self.session_counters['expired'] += 1
+                session_ids.append(session_id)
+        return session_ids
+
+    def _now(self) -> datetime:
+        """
+        Current time, in the time base of the session timestamps
+
+        """
+        return datetime.now()
+
+    def session_metrics(self) -> dict:
+        """
+        Return the live and expired (reaped) session counts
+
+        """
+        self.reap_expired_sessions()
+        return {
+            'live': len(self.user_id_by_session_id),
+            'expired': self.session_counters['expired'],
+        }
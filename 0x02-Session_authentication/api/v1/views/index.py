@@ -21,8 +21,11 @@ def stats() -> str:
       - the number of each objects
     """
     from models.user import User
+    from api.v1.app import auth
     stats = {}
     stats['users'] = User.count()
+    if hasattr(auth, 'session_metrics'):
+        stats['sessions'] = auth.session_metrics()
     return jsonify(stats)
 
 
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+""" Startup-time benchmark of Base.load_from_file
+
+Usage: ./bench_load.py [number_of_sessions]
+
+Writes a `.db_UserSession.json` with N sessions in a temporary directory
+and loads it in a fresh interpreter per mode, reporting wall time and
+peak RSS:
+  - legacy: the original loader (json.load, strptime, a uuid4 per
+            object, no indexes)
+  - json:   load_from_file() (json.load, the default)
+  - stream: load_from_file(stream=True)
+  - lazy:   load_from_file(lazy=True)
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+
+MODES = ("legacy", "json", "stream", "lazy")
+
+
+def write_sessions(file_path: str, count: int) -> None:
+    """ Write `count` UserSession rows in the .db_*.json format
+    """
+    start = datetime(2024, 1, 1)
+    with open(file_path, 'w') as f:
+        f.write("{")
+        for i in range(count):
+            obj_id = str(uuid.uuid4())
+            ts = (start + timedelta(seconds=i)).strftime("%Y-%m-%dT%H:%M:%S")
+            obj = {"id": obj_id, "created_at": ts, "updated_at": ts,
+                   "user_id": str(uuid.uuid4()),
+                   "session_id": str(uuid.uuid4())}
+            if i > 0:
+                f.write(", ")
+            f.write("{}: {}".format(json.dumps(obj_id), json.dumps(obj)))
+        f.write("}")
+
+
+def legacy_load(cls: type) -> None:
+    """ Base.load_from_file and Base.__init__ as they were originally
+    """
+    from models.base import DATA, TIMESTAMP_FORMAT
+
+    DATA[cls.__name__] = {}
+    with open(".db_{}.json".format(cls.__name__)) as f:
+        objs_json = json.load(f)
+        for obj_id, obj_json in objs_json.items():
+            obj = cls.__new__(cls)
+            obj.id = obj_json.get('id', str(uuid.uuid4()))
+            obj.created_at = datetime.strptime(obj_json['created_at'],
+                                               TIMESTAMP_FORMAT)
+            obj.updated_at = datetime.strptime(obj_json['updated_at'],
+                                               TIMESTAMP_FORMAT)
+            obj.user_id = obj_json.get('user_id')
+            obj.session_id = obj_json.get('session_id')
+            DATA[cls.__name__][obj_id] = obj
+
+
+def run_mode(mode: str) -> None:
+    """ Load the file in the current directory and print the results
+    """
+    from models.user_session import UserSession
+
+    start = time.perf_counter()
+    if mode == "legacy":
+        legacy_load(UserSession)
+    else:
+        UserSession.load_from_file(lazy=(mode == "lazy"),
+                                   stream=(mode != "json"))
+    elapsed = time.perf_counter() - start
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "count": UserSession.count(),
+                      "seconds": elapsed, "peak_rss_kb": rss}))
+
+
+def bench_timestamps(count: int = 200000) -> None:
+    """ Compare the per-call cost of the two timestamp parsers
+    """
+    value = "2024-06-04T19:47:50"
+    start = time.perf_counter()
+    for _ in range(count):
+        datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+    strptime_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(count):
+        datetime.fromisoformat(value)
+    iso_s = time.perf_counter() - start
+    print("strptime:      {:.2f} us/call".format(strptime_s / count * 1e6))
+    print("fromisoformat: {:.2f} us/call".format(iso_s / count * 1e6))
+
+
+def main() -> None:
+    """ Run every mode in its own interpreter and print a summary
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here)
+    env.pop("DB_JOURNAL", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_sessions(os.path.join(tmp, ".db_UserSession.json"), count)
+        size = os.path.getsize(os.path.join(tmp, ".db_UserSession.json"))
+        print("{} sessions, {:.1f} MB".format(count, size / 1e6))
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--run", mode],
+                cwd=tmp, env=env, check=True, capture_output=True, text=True)
+            result = json.loads(out.stdout)
+            print("{:8} {:8.2f} s {:10.1f} MB peak RSS".format(
+                mode, result["seconds"], result["peak_rss_kb"] / 1024))
+    bench_timestamps()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        run_mode(sys.argv[2])
+    else:
+        main()
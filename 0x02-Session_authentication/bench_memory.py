@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+""" Memory benchmark of the default and compact model representations
+
+Usage: ./bench_memory.py [number_of_sessions]
+
+Builds N resident UserSession objects in a fresh interpreter with
+DB_COMPACT_MODELS=0 then =1, and reports the traced memory per object.
+The first figure includes the field values, DATA and the session_id
+index; the second is the instance and its `__dict__` alone. Both runs
+also check that to_json, search and get agree.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+
+def run_mode(count: int) -> None:
+    """ Build `count` sessions and print the memory used per object
+    """
+    from models.base import COMPACT_MODELS, DATA, RAW
+    from models.user_session import UserSession
+
+    DATA["UserSession"] = {}
+    RAW["UserSession"] = {}
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    for i in range(count):
+        obj_json = {"id": "id-{:08d}".format(i),
+                    "created_at": "2024-06-04T19:47:50",
+                    "updated_at": "2024-06-04T19:47:50",
+                    "user_id": "user-{:08d}".format(i),
+                    "session_id": "session-{:08d}".format(i)}
+        UserSession._load_json(obj_json["id"], obj_json, False)
+    elapsed = time.perf_counter() - start
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    sample = UserSession.get("id-00000007")
+    found = UserSession.search({"session_id": "session-00000007"})
+    assert found == [sample]
+    instance = sys.getsizeof(sample)
+    if hasattr(sample, "__dict__"):
+        instance += sys.getsizeof(sample.__dict__)
+    print(json.dumps({"compact": COMPACT_MODELS,
+                      "bytes_per_object": used / count,
+                      "instance_bytes": instance,
+                      "seconds": elapsed,
+                      "to_json": sample.to_json(True)}))
+
+
+def main() -> None:
+    """ Run both representations and print a comparison
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    here = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for compact in ("0", "1"):
+        env = dict(os.environ, PYTHONPATH=here, DB_COMPACT_MODELS=compact)
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run", str(count)],
+            env=env, check=True, capture_output=True, text=True)
+        results.append(json.loads(out.stdout))
+    assert results[0]["to_json"] == results[1]["to_json"]
+    print("{} resident UserSession objects".format(count))
+    for result in results:
+        print("{:6} {:7.1f} bytes/object {:5} bytes/instance "
+              "{:6.2f} s to build".format(
+                  "slots" if result["compact"] else "dict",
+                  result["bytes_per_object"], result["instance_bytes"],
+                  result["seconds"]))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        run_mode(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+""" Password check benchmark of the SHA-256 and PBKDF2 schemes
+
+Usage: ./bench_password.py [checks]
+
+Times `checks` User.is_valid_password calls against the PBKDF2-SHA256
+format with User.verified_cache disabled, and a thousand times as many
+against an unsalted SHA-256 hash (the former scheme, checked as it used
+to be) and with the cache enabled, as on repeated Basic auth requests.
+It also checks that a SHA-256 hash is upgraded to PBKDF2 by the first
+successful check.
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+os.chdir(tempfile.mkdtemp())
+
+
+def main() -> None:
+    """ Time each scheme and print the checks per second
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    from models.base import DATA
+    from models.cache import TTLCache
+    from models.user import PBKDF2_ITERATIONS, User
+
+    DATA["User"] = {}
+    password = "H0lberton School 98!"
+    legacy_hash = hashlib.sha256(password.encode()).hexdigest().lower()
+
+    user = User(email="bob@hbtn.io", _password=legacy_hash)
+    user.save()
+    assert user.is_valid_password(password)
+    assert user.password.startswith("pbkdf2_sha256$")
+    assert User.get(user.id).password == user.password
+    assert not user.is_valid_password(password + "?")
+
+    def legacy_check():
+        """ The former is_valid_password """
+        pwd_e = password.encode()
+        return hashlib.sha256(pwd_e).hexdigest().lower() == legacy_hash
+
+    warm_cache = User.verified_cache
+    runs = (("sha256", legacy_check, None),
+            ("pbkdf2", lambda: user.is_valid_password(password),
+             TTLCache(maxsize=0)),
+            ("pbkdf2+cache", lambda: user.is_valid_password(password),
+             warm_cache))
+    print("{} checks, PBKDF2 at {} iterations".format(count,
+                                                      PBKDF2_ITERATIONS))
+    for name, check, cache in runs:
+        if cache is not None:
+            User.verified_cache = cache
+        n = count if name == "pbkdf2" else count * 1000
+        start = time.perf_counter()
+        for _ in range(n):
+            assert check()
+        elapsed = time.perf_counter() - start
+        print("{:13} {:12.1f} checks/sec {:10.1f} us/check".format(
+            name, n / elapsed, elapsed / n * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+""" Request-latency benchmark of the before_request auth hook
+
+Usage: AUTH_TYPE=basic_auth ./bench_request.py [requests] [users]
+       AUTH_TYPE=session_db_auth ./bench_request.py [requests] [users]
+
+Sends GET /api/v1/users/me through the Flask test client, first with
+the former hook (current_user resolved twice, without memoization) then
+with the current one, and prints the mean latency of each request and
+of the hook alone. The Basic auth credentials cache is disabled so each
+resolution decodes the header and searches the user; the password check
+itself is served by User.verified_cache.
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("AUTH_TYPE", "basic_auth")
+os.environ["BASIC_AUTH_CACHE_SIZE"] = "0"
+os.environ.setdefault("SESSION_NAME", "_my_session_id")
+os.chdir(tempfile.mkdtemp())
+
+
+def main() -> None:
+    """ Run both hooks and print their mean latency
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    from flask import abort, request
+    from api.v1 import app as app_module
+    from models.base import DATA
+    from models.user import User
+
+    app, auth = app_module.app, app_module.auth
+    DATA["User"] = {}
+    email, password = "user7@example.com", "pwd"
+    hashed_password = User.hash_password(password)
+    for i in range(users):
+        user = User(email="user{}@example.com".format(i),
+                    _password=hashed_password)
+        DATA["User"][user.id] = user
+        user._index()
+
+    client = app.test_client()
+    if os.getenv("AUTH_TYPE") == "basic_auth":
+        token = base64.b64encode(
+            "{}:{}".format(email, password).encode()).decode()
+        headers = {"Authorization": "Basic " + token}
+    else:
+        headers = {}
+        session_id = auth.create_session(User.search({"email": email})[0].id)
+        client.set_cookie(os.getenv("SESSION_NAME"), session_id)
+
+    def legacy_before_request():
+        """ The hook before memoization: resolves the user twice
+        """
+        if not auth.require_auth(request.path, app_module.EXCLUDED_PATHS):
+            return None
+        request.current_user = auth.current_user.__wrapped__(auth, request)
+        if auth.current_user.__wrapped__(auth, request) is None:
+            abort(403)
+
+    def timed(hook, spent):
+        """ Wrap `hook`, adding its run time to spent[0]
+        """
+        def timed_hook():
+            start = time.perf_counter()
+            try:
+                return hook()
+            finally:
+                spent[0] += time.perf_counter() - start
+        return timed_hook
+
+    hooks = app.before_request_funcs[None]
+    current_hook = hooks[0]
+    for name, hook in (("legacy", legacy_before_request),
+                       ("memoized", current_hook)):
+        spent = [0.0]
+        hooks[0] = timed(hook, spent)
+        assert client.get("/api/v1/users/me",
+                          headers=headers).status_code == 200
+        spent[0] = 0.0
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get("/api/v1/users/me", headers=headers)
+        elapsed = time.perf_counter() - start
+        print("{:9} {:8.1f} us/request {:8.1f} us in before_request".format(
+            name, elapsed / count * 1e6, spent[0] / count * 1e6))
+    hooks[0] = current_hook
+
+
+if __name__ == "__main__":
+    main()
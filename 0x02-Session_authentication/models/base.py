@@ -2,20 +2,189 @@
 """ Base module
 """
 from datetime import datetime
-from typing import TypeVar, List, Iterable
+from functools import lru_cache
+import bisect
+from typing import TypeVar, List, Iterable, Iterator, Tuple
 from os import path
 import json
+import os
+import threading
 import uuid
 
+from models.engine.storage import Storage
+from models.journal import Journal
+from models.json_stream import iter_json_items
+
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+RAW = {}
+INDEXES = {}
+JOURNALS = {}
+LOCK = threading.RLock()
+COMPACT_MODELS = os.getenv('DB_COMPACT_MODELS', '0').lower() in \
+    ('1', 'true', 'yes')
+STORAGE = {}
+
+
+def get_storage() -> Storage:
+    """ Return the storage engine selected by `DB_STORAGE`, or None for
+    the built-in `DATA` dictionary and JSON files
+    """
+    if 'engine' not in STORAGE:
+        with LOCK:
+            if 'engine' not in STORAGE:
+                engine = None
+                if os.getenv('DB_STORAGE', 'file') == 'sqlite':
+                    from models.engine.sqlite_storage import SQLiteStorage
+                    engine = SQLiteStorage(
+                        os.getenv('DB_SQLITE_PATH', '.db.sqlite3'))
+                STORAGE['engine'] = engine
+    return STORAGE['engine']
+
+
+@lru_cache(maxsize=None)
+def slot_names(cls: type) -> Tuple[str, ...]:
+    """ Return the attribute slots declared along the MRO of `cls`
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        for name in slots:
+            if name not in ('__dict__', '__weakref__') and name not in names:
+                names.append(name)
+    return tuple(names)
+
+
+def index_key(value):
+    """ Return the value an index stores for `value`: datetimes as ISO
+    text, which sorts like them and matches the JSON of lazily loaded
+    objects
+    """
+    if type(value) is datetime:
+        return value.isoformat()
+    return value
+
+
+class Index():
+    """ Hash index of one attribute over the stored objects of a class
+
+    An `ordered` index also keeps its distinct values sorted, for range
+    queries with `before`.
+    """
+
+    def __init__(self, attribute: str, ordered: bool = False):
+        """ Initialize an empty index on `attribute`
+        """
+        self.attribute = attribute
+        self.ids_by_value = {}
+        self.value_by_id = {}
+        self.unhashable_ids = {}
+        self.sorted_values = [] if ordered else None
+
+    def add(self, obj_id: str, value) -> None:
+        """ Index `obj_id` under `value`, replacing any previous entry
+        """
+        self.discard(obj_id)
+        value = index_key(value)
+        try:
+            ids = self.ids_by_value.get(value)
+        except TypeError:
+            self.unhashable_ids[obj_id] = None
+            return
+        if ids is None:
+            ids = self.ids_by_value[value] = {}
+            if self.sorted_values is not None and value is not None:
+                try:
+                    bisect.insort(self.sorted_values, value)
+                except TypeError:
+                    pass
+        ids[obj_id] = None
+        self.value_by_id[obj_id] = value
+
+    def discard(self, obj_id: str) -> None:
+        """ Remove `obj_id` from the index
+        """
+        self.unhashable_ids.pop(obj_id, None)
+        if obj_id not in self.value_by_id:
+            return
+        value = self.value_by_id.pop(obj_id)
+        ids = self.ids_by_value.get(value)
+        if ids is not None:
+            ids.pop(obj_id, None)
+            if len(ids) == 0:
+                del self.ids_by_value[value]
+                if self.sorted_values is not None:
+                    self._unsort(value)
+
+    def _unsort(self, value) -> None:
+        """ Remove `value` from the sorted values
+        """
+        try:
+            i = bisect.bisect_left(self.sorted_values, value)
+        except TypeError:
+            return
+        if i < len(self.sorted_values) and self.sorted_values[i] == value:
+            del self.sorted_values[i]
+
+    def lookup(self, value) -> List[str]:
+        """ Return the IDs of objects that may have `value`
+        """
+        ids = list(self.ids_by_value.get(index_key(value), {}))
+        if len(self.unhashable_ids) > 0:
+            ids.extend(self.unhashable_ids)
+        return ids
+
+    def before(self, value, limit: int = None) -> List[str]:
+        """ Return the IDs of objects whose value is lower than `value`,
+        lowest first, at most `limit` of them
+        """
+        end = bisect.bisect_left(self.sorted_values, index_key(value))
+        ids = []
+        for key in self.sorted_values[:end]:
+            ids.extend(self.ids_by_value[key])
+            if limit is not None and len(ids) >= limit:
+                return ids[:limit]
+        return ids
 
 
 class Base():
     """ Base class
+
+    Subclasses can list attributes in `indexed_attributes` to get a hash
+    index on them: `search` then resolves matching queries without
+    scanning every stored object. Indexes reflect the last `save()`.
+    Those also listed in `sorted_attributes` keep their values sorted,
+    so `search_before` reads the lowest ones without a scan.
+
+    With `DB_JOURNAL=1`, `save()` and `remove()` append one record to
+    `.db_<Class>.journal` instead of rewriting `.db_<Class>.json`; the
+    journal is compacted into the JSON snapshot in the background (every
+    `DB_JOURNAL_COMPACT_INTERVAL` seconds) and replayed by
+    `load_from_file()`.
+
+    `load_from_file()` decodes the snapshot with `json.load`; with
+    `stream=True` (or `DB_STREAM_LOAD=1`) it reads one object at a time
+    instead, which is slower but bounds the memory used by the decoding.
+    With `lazy=True` (or `DB_LAZY_LOAD=1`) the snapshot is streamed and
+    each object stays as its compact JSON text in `RAW` until first
+    returned by `get()` or `search()`.
+
+    With `DB_COMPACT_MODELS=1` (read at import), models declare their
+    fields as `__slots__` instead of keeping a per-instance `__dict__`.
+
+    With `DB_STORAGE=sqlite`, `get`, `search`, `all`, `count`, `save` and
+    `remove` delegate to a `models.engine` storage engine instead, and
+    the file-specific options above do not apply.
     """
 
+    indexed_attributes = ()
+    sorted_attributes = ()
+    if COMPACT_MODELS:
+        __slots__ = ('id', 'created_at', 'updated_at')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
@@ -23,15 +192,13 @@ class Base():
         if DATA.get(s_class) is None:
             DATA[s_class] = {}
 
-        self.id = kwargs.get('id', str(uuid.uuid4()))
+        self.id = kwargs['id'] if 'id' in kwargs else str(uuid.uuid4())
         if kwargs.get('created_at') is not None:
-            self.created_at = datetime.strptime(kwargs.get('created_at'),
-                                                TIMESTAMP_FORMAT)
+            self.created_at = datetime.fromisoformat(kwargs.get('created_at'))
         else:
             self.created_at = datetime.utcnow()
         if kwargs.get('updated_at') is not None:
-            self.updated_at = datetime.strptime(kwargs.get('updated_at'),
-                                                TIMESTAMP_FORMAT)
+            self.updated_at = datetime.fromisoformat(kwargs.get('updated_at'))
         else:
             self.updated_at = datetime.utcnow()
 
@@ -48,7 +215,7 @@ class Base():
         """ Convert the object a JSON dictionary
         """
         result = {}
-        for key, value in self.__dict__.items():
+        for key, value in self._attributes():
             if not for_serialization and key[0] == '_':
                 continue
             if type(value) is datetime:
@@ -57,56 +224,301 @@ class Base():
                 result[key] = value
         return result
 
+    def _attributes(self) -> Iterator[Tuple[str, object]]:
+        """ Iterate over the (name, value) pairs of the instance fields,
+        slots first then `__dict__`
+        """
+        for name in slot_names(self.__class__):
+            try:
+                yield name, getattr(self, name)
+            except AttributeError:
+                continue
+        obj_dict = getattr(self, '__dict__', None)
+        if obj_dict:
+            yield from obj_dict.items()
+
     @classmethod
-    def load_from_file(cls):
+    def load_from_file(cls, lazy: bool = None, stream: bool = None):
         """ Load all objects from file
         """
+        storage = get_storage()
+        if storage is not None:
+            storage.load(cls)
+            return
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        if lazy is None:
+            lazy = os.getenv('DB_LAZY_LOAD', '0').lower() in \
+                ('1', 'true', 'yes')
+        if stream is None:
+            stream = lazy or os.getenv('DB_STREAM_LOAD', '0').lower() in \
+                ('1', 'true', 'yes')
+        journal = cls._journal()
+        with LOCK:
+            if journal is not None:
+                journal.flush()
+            DATA[s_class] = {}
+            RAW[s_class] = {}
+            cls._reset_indexes()
+            if path.exists(file_path):
+                with open(file_path, 'r') as f:
+                    if lazy:
+                        for obj_id, obj_json, obj_text in \
+                                iter_json_items(f, with_text=True):
+                            cls._load_json(obj_id, obj_json, lazy, obj_text)
+                    else:
+                        items = iter_json_items(f) if stream else \
+                            json.load(f).items()
+                        for obj_id, obj_json in items:
+                            cls._load_json(obj_id, obj_json, lazy)
+
+            if journal is None:
+                return
+            for record in journal.replay():
+                if record.get('op') == 'save':
+                    obj_json = record['obj']
+                    cls._load_json(obj_json['id'], obj_json, lazy)
+                else:
+                    cls._unload(record.get('id'))
+
+    @classmethod
+    def _load_json(cls, obj_id: str, obj_json: dict, lazy: bool,
+                   obj_text: str = None):
+        """ Store one loaded object, as JSON text if `lazy` else built
+
+        `obj_text` is the JSON text of `obj_json`, when already known.
+        """
+        s_class = cls.__name__
+        if not lazy:
+            RAW[s_class].pop(obj_id, None)
+            obj = cls(**obj_json)
+            DATA[s_class][obj_id] = obj
+            obj._index()
             return
+        DATA[s_class].pop(obj_id, None)
+        if obj_text is None:
+            obj_text = json.dumps(obj_json, separators=(',', ':'))
+        RAW[s_class][obj_id] = obj_text
+        for attribute, index in cls._indexes().items():
+            index.add(obj_id, obj_json.get(attribute))
+
+    @classmethod
+    def _unload(cls, obj_id: str) -> bool:
+        """ Drop one object, loaded or not, from memory and indexes
+        """
+        s_class = cls.__name__
+        found = DATA[s_class].pop(obj_id, None) is not None
+        if RAW.get(s_class) and RAW[s_class].pop(obj_id, None) is not None:
+            found = True
+        if found:
+            for index in cls._indexes().values():
+                index.discard(obj_id)
+        return found
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def _materialize(cls, obj_id: str) -> TypeVar('Base'):
+        """ Build the object `obj_id` from its lazily loaded JSON
+        """
+        s_class = cls.__name__
+        with LOCK:
+            obj = DATA[s_class].get(obj_id)
+            if obj is not None:
+                return obj
+            obj_text = RAW[s_class].pop(obj_id, None)
+            if obj_text is None:
+                return None
+            obj = cls(**json.loads(obj_text))
+            DATA[s_class][obj_id] = obj
+            return obj
+
+    @classmethod
+    def _materialize_all(cls):
+        """ Build every lazily loaded object of the class
+        """
+        s_class = cls.__name__
+        with LOCK:
+            for obj_id in list(RAW[s_class]):
+                cls._materialize(obj_id)
+
+    @classmethod
+    def _serialize_all(cls) -> dict:
+        """ Return the JSON dictionaries of all objects, by ID
+        """
+        s_class = cls.__name__
+        objs_json = {}
+        with LOCK:
+            for obj_id, obj in DATA[s_class].items():
+                objs_json[obj_id] = obj.to_json(True)
+            for obj_id, obj_text in (RAW.get(s_class) or {}).items():
+                objs_json[obj_id] = json.loads(obj_text)
+        return objs_json
 
     @classmethod
     def save_to_file(cls):
         """ Save all objects to file
         """
+        if get_storage() is not None:
+            return
         s_class = cls.__name__
         file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        if cls._journal() is not None:
+            cls._compact()
+            return
 
+        objs_json = cls._serialize_all()
         with open(file_path, 'w') as f:
             json.dump(objs_json, f)
 
+    @classmethod
+    def _journal(cls) -> Journal:
+        """ Return the journal of the class, or None if journaling is off
+        """
+        s_class = cls.__name__
+        if s_class not in JOURNALS:
+            with LOCK:
+                if s_class not in JOURNALS:
+                    JOURNALS[s_class] = None
+                    if os.getenv('DB_JOURNAL', '0').lower() in \
+                            ('1', 'true', 'yes'):
+                        JOURNALS[s_class] = Journal(
+                            ".db_{}.journal".format(s_class), cls._compact,
+                            float(os.getenv('DB_JOURNAL_FSYNC_INTERVAL',
+                                            0.05)),
+                            float(os.getenv('DB_JOURNAL_COMPACT_INTERVAL',
+                                            300)))
+        return JOURNALS[s_class]
+
+    @classmethod
+    def _compact(cls):
+        """ Fold the journal of the class into its JSON snapshot
+        """
+        s_class = cls.__name__
+        journal = cls._journal()
+        with journal.compaction_lock:
+            with LOCK:
+                journal.rotate()
+                objs_json = cls._serialize_all()
+            journal.write_snapshot(".db_{}.json".format(s_class), objs_json)
+
     def save(self):
         """ Save current object
         """
         s_class = self.__class__.__name__
         self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        storage = get_storage()
+        if storage is not None:
+            storage.save(self)
+            return
+        journal = self.__class__._journal()
+        with LOCK:
+            if RAW.get(s_class):
+                RAW[s_class].pop(self.id, None)
+            DATA[s_class][self.id] = self
+            self._index()
+            if journal is None:
+                self.__class__.save_to_file()
+            else:
+                journal.append({'op': 'save', 'obj': self.to_json(True)})
 
     def remove(self):
         """ Remove object
         """
-        s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
-            del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+        storage = get_storage()
+        if storage is not None:
+            storage.remove(self)
+            return
+        journal = self.__class__._journal()
+        with LOCK:
+            if not self.__class__._unload(self.id):
+                return
+            if journal is None:
+                self.__class__.save_to_file()
+            else:
+                journal.append({'op': 'remove', 'id': self.id})
+
+    @classmethod
+    def bulk_remove(cls, objs: Iterable[TypeVar('Base')]) -> int:
+        """ Remove several objects, persisting once
+        """
+        objs = list(objs)
+        storage = get_storage()
+        if storage is not None:
+            return storage.remove_many(cls, objs)
+        journal = cls._journal()
+        removed = 0
+        with LOCK:
+            for obj in objs:
+                if not cls._unload(obj.id):
+                    continue
+                removed += 1
+                if journal is not None:
+                    journal.append({'op': 'remove', 'id': obj.id})
+            if removed > 0 and journal is None:
+                cls.save_to_file()
+        return removed
+
+    @classmethod
+    def bulk_create(cls, objs: Iterable[TypeVar('Base')]) -> int:
+        """ Save several objects, persisting once
+
+        Unlike `save`, the timestamps of the objects are kept as they
+        are, so imported objects keep their history.
+        """
+        objs = list(objs)
+        storage = get_storage()
+        if storage is not None:
+            return storage.save_many(cls, objs)
+        s_class = cls.__name__
+        journal = cls._journal()
+        with LOCK:
+            DATA.setdefault(s_class, {})
+            raw = RAW.get(s_class)
+            for obj in objs:
+                if raw:
+                    raw.pop(obj.id, None)
+                DATA[s_class][obj.id] = obj
+                obj._index()
+                if journal is not None:
+                    journal.append({'op': 'save', 'obj': obj.to_json(True)})
+            if objs and journal is None:
+                cls.save_to_file()
+        return len(objs)
+
+    @classmethod
+    def export(cls) -> Iterator[dict]:
+        """ Yield the JSON dictionary of every object, one at a time
+
+        Lazily loaded objects are decoded from their JSON text without
+        being built. Objects saved or removed during the export may or may
+        not be included.
+        """
+        storage = get_storage()
+        if storage is not None:
+            yield from storage.iter_json(cls)
+            return
+        s_class = cls.__name__
+        with LOCK:
+            obj_ids = list(DATA.get(s_class) or {})
+            obj_ids.extend(RAW.get(s_class) or {})
+        for obj_id in obj_ids:
+            with LOCK:
+                obj = (DATA.get(s_class) or {}).get(obj_id)
+                obj_json = obj.to_json(True) if obj is not None else \
+                    (RAW.get(s_class) or {}).get(obj_id)
+            if isinstance(obj_json, str):
+                obj_json = json.loads(obj_json)
+            if obj_json is not None:
+                yield obj_json
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        storage = get_storage()
+        if storage is not None:
+            return storage.count(cls)
         s_class = cls.__name__
-        return len(DATA[s_class].keys())
+        return len(DATA[s_class].keys()) + len(RAW.get(s_class) or {})
 
     @classmethod
     def all(cls) -> Iterable[TypeVar('Base')]:
@@ -118,13 +530,52 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        storage = get_storage()
+        if storage is not None:
+            return storage.get(cls, id)
         s_class = cls.__name__
-        return DATA[s_class].get(id)
+        obj = DATA[s_class].get(id)
+        if obj is None and RAW.get(s_class):
+            obj = cls._materialize(id)
+        return obj
+
+    @classmethod
+    def _reset_indexes(cls):
+        """ Drop and recreate the empty indexes of the class
+        """
+        INDEXES[cls.__name__] = {
+            attribute: Index(attribute, attribute in cls.sorted_attributes)
+            for attribute in cls.indexed_attributes
+        }
+
+    @classmethod
+    def _indexes(cls) -> dict:
+        """ Return the indexes of the class, by attribute
+        """
+        s_class = cls.__name__
+        if INDEXES.get(s_class) is None:
+            cls._reset_indexes()
+        return INDEXES[s_class]
+
+    def _index(self):
+        """ Index current object on its indexed attributes
+        """
+        for attribute, index in self.__class__._indexes().items():
+            index.add(self.id, getattr(self, attribute, None))
+
+    def _unindex(self):
+        """ Remove current object from the indexes
+        """
+        for index in self.__class__._indexes().values():
+            index.discard(self.id)
 
     @classmethod
     def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
         """
+        storage = get_storage()
+        if storage is not None:
+            return storage.search(cls, attributes)
         s_class = cls.__name__
         def _search(obj):
             if len(attributes) == 0:
@@ -133,5 +584,46 @@ class Base():
                 if (getattr(obj, k) != v):
                     return False
             return True
-        
-        return list(filter(_search, DATA[s_class].values()))
+
+        candidates = None
+        indexes = cls._indexes()
+        for k, v in attributes.items():
+            if indexes.get(k) is None:
+                continue
+            try:
+                ids = indexes[k].lookup(v)
+            except TypeError:
+                continue
+            if candidates is None or len(ids) < len(candidates):
+                candidates = ids
+        if candidates is None:
+            if RAW.get(s_class):
+                cls._materialize_all()
+            return list(filter(_search, DATA[s_class].values()))
+
+        objs = (cls.get(obj_id) for obj_id in candidates)
+        return [obj for obj in objs if obj is not None and _search(obj)]
+
+    @classmethod
+    def search_before(cls, attribute: str, value,
+                      limit: int = None) -> List[TypeVar('Base')]:
+        """ Return the objects whose `attribute` is lower than `value`,
+        lowest first, at most `limit` of them
+        """
+        storage = get_storage()
+        if storage is not None:
+            return storage.search_before(cls, attribute, index_key(value),
+                                         limit)
+        index = cls._indexes().get(attribute)
+        if index is None or index.sorted_values is None:
+            key = index_key(value)
+            objs = sorted((obj for obj in cls.search()
+                           if getattr(obj, attribute, None) is not None and
+                           index_key(getattr(obj, attribute)) < key),
+                          key=lambda obj: index_key(getattr(obj, attribute)))
+            return objs[:limit] if limit is not None else objs
+
+        with LOCK:
+            obj_ids = index.before(value, limit)
+        objs = (cls.get(obj_id) for obj_id in obj_ids)
+        return [obj for obj in objs if obj is not None]
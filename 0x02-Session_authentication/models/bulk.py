@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+""" Bulk module
+
+Load or dump the objects of a model as newline-delimited JSON:
+
+    python3 -m models.bulk load users.ndjson
+    python3 -m models.bulk dump users.ndjson
+    python3 -m models.bulk dump - --model UserSession
+
+Each line is the `to_json(True)` dictionary of one object, as written by
+`dump`. On `load`, a line with a plain `password` instead of `_password`
+gets it hashed (which costs one key derivation per line). Objects are
+stored with `Base.bulk_create`, which persists once.
+"""
+from typing import IO, Iterator
+import argparse
+import importlib
+import json
+import re
+import sys
+
+
+CHUNK_SIZE = 10000
+
+
+def model_class(name: str) -> type:
+    """ Return the model class `name`, from models/<snake_case name>.py
+    """
+    module_name = re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+    module = importlib.import_module("models.{}".format(module_name))
+    return getattr(module, name)
+
+
+def iter_objects(cls: type, lines: IO[str]) -> Iterator:
+    """ Yield one object of `cls` per non-empty JSON line
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            obj_json = json.loads(line)
+        except ValueError as e:
+            raise ValueError("line {}: {}".format(number, e))
+        password = obj_json.pop('password', None)
+        obj = cls(**obj_json)
+        if password is not None:
+            obj.password = password
+        yield obj
+
+
+def load(cls: type, lines: IO[str]) -> int:
+    """ Store every object of `lines`, persisting once
+    """
+    cls.load_from_file()
+    return cls.bulk_create(iter_objects(cls, lines))
+
+
+def dump(cls: type, out: IO[str]) -> int:
+    """ Write every object of `cls` as one JSON line, return how many
+    """
+    cls.load_from_file()
+    count = 0
+    lines = []
+    for obj_json in cls.export():
+        lines.append(json.dumps(obj_json))
+        count += 1
+        if len(lines) >= CHUNK_SIZE:
+            out.write("\n".join(lines) + "\n")
+            lines = []
+    if lines:
+        out.write("\n".join(lines) + "\n")
+    return count
+
+
+def main() -> None:
+    """ Command line entry point
+    """
+    parser = argparse.ArgumentParser(
+        prog="python3 -m models.bulk",
+        description="Load or dump model objects as newline-delimited JSON")
+    parser.add_argument("command", choices=("load", "dump"))
+    parser.add_argument("file", nargs="?", default="-",
+                        help="NDJSON file, - for stdin/stdout (default)")
+    parser.add_argument("--model", default="User",
+                        help="model class name (default: User)")
+    args = parser.parse_args()
+    cls = model_class(args.model)
+
+    if args.command == "load":
+        f = sys.stdin if args.file == "-" else open(args.file)
+        try:
+            count = load(cls, f)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    else:
+        f = sys.stdout if args.file == "-" else open(args.file, "w")
+        try:
+            count = dump(cls, f)
+        finally:
+            if f is not sys.stdout:
+                f.close()
+    print("{} {} {}ed".format(count, cls.__name__, args.command),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+""" SQLite storage module
+
+Stores each model class in its own table so that several processes
+(e.g. gunicorn workers of api/v1/app.py) share one database file:
+
+    CREATE TABLE "User" (id TEXT PRIMARY KEY, email, data TEXT NOT NULL)
+
+`data` holds `to_json(True)`; every attribute of `indexed_attributes`
+also gets its own indexed column (holding its JSON value), so `search`
+and `search_before` on it are index lookups.
+"""
+from typing import Iterator, List, Tuple, TypeVar
+import json
+import os
+import sqlite3
+import threading
+
+from models.engine.storage import Storage
+
+
+_BINDABLE = (str, int, float, type(None))
+
+
+class SQLiteStorage(Storage):
+    """ SQLite storage engine, in WAL mode with one connection per thread
+    """
+
+    def __init__(self, db_path: str):
+        """ Initialize the engine on the database file `db_path`
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._statements = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        """ Return the connection of the current thread, opening it on
+        first use and again after a fork
+        """
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30,
+                                   isolation_level=None,
+                                   check_same_thread=False,
+                                   cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            local.conn = conn
+            local.pid = os.getpid()
+        return local.conn
+
+    def _sql(self, cls: type) -> dict:
+        """ Return the SQL statements of `cls`, creating its table on
+        first use; statements are constant strings so that sqlite3
+        reuses its prepared statements
+        """
+        statements = self._statements.get(cls.__name__)
+        if statements is not None:
+            return statements
+        with self._lock:
+            if cls.__name__ not in self._statements:
+                self._statements[cls.__name__] = self._create_table(cls)
+        return self._statements[cls.__name__]
+
+    def _create_table(self, cls: type) -> dict:
+        """ Create (or migrate) the table of `cls` and its indexes
+
+        Runs in a BEGIN IMMEDIATE transaction, so that workers starting
+        together migrate one at a time and the others see the columns
+        already added.
+        """
+        table = cls.__name__
+        columns = tuple(cls.indexed_attributes)
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute('CREATE TABLE IF NOT EXISTS "{}" '
+                         '(id TEXT PRIMARY KEY, data TEXT NOT NULL)'
+                         .format(table))
+            existing = {row[1] for row in conn.execute(
+                'PRAGMA table_info("{}")'.format(table))}
+            for column in columns:
+                if column not in existing:
+                    conn.execute('ALTER TABLE "{}" ADD COLUMN "{}"'
+                                 .format(table, column))
+                    conn.execute('UPDATE "{0}" SET "{1}" = '
+                                 'json_extract(data, \'$."{1}"\')'
+                                 .format(table, column))
+                conn.execute('CREATE INDEX IF NOT EXISTS "ix_{0}_{1}" '
+                             'ON "{0}" ("{1}")'.format(table, column))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        names = ", ".join('"{}"'.format(c) for c in ("id",) + columns)
+        marks = ", ".join("?" for _ in range(len(columns) + 2))
+        where, before = {}, {}
+        for column in columns:
+            where[column] = 'SELECT data FROM "{}" WHERE "{}" IS ?'.format(
+                table, column)
+            before[column] = ('SELECT data FROM "{0}" WHERE "{1}" < ? '
+                              'ORDER BY "{1}" LIMIT ?'.format(table, column))
+        return {
+            'columns': columns,
+            'insert': 'INSERT OR REPLACE INTO "{}" ({}, data) VALUES ({})'
+                      .format(table, names, marks),
+            'delete': 'DELETE FROM "{}" WHERE id = ?'.format(table),
+            'get': 'SELECT data FROM "{}" WHERE id = ?'.format(table),
+            'all': 'SELECT data FROM "{}"'.format(table),
+            'count': 'SELECT COUNT(*) FROM "{}"'.format(table),
+            'where': where,
+            'before': before,
+        }
+
+    def load(self, cls: type) -> None:
+        """ Create the table of `cls` if needed
+        """
+        self._sql(cls)
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ Return the object of `cls` with this ID, or None
+        """
+        row = self._connection().execute(self._sql(cls)['get'],
+                                         (id,)).fetchone()
+        if row is None:
+            return None
+        return cls(**json.loads(row[0]))
+
+    def search(self, cls: type,
+               attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects of `cls` matching all `attributes`
+
+        The first indexed attribute with a bindable value is matched in
+        SQL; the other attributes are checked on the built objects.
+        """
+        sql = self._sql(cls)
+        query, params = sql['all'], ()
+        for k, v in attributes.items():
+            if k in sql['where'] and isinstance(v, _BINDABLE):
+                query, params = sql['where'][k], (v,)
+                break
+        rows = self._connection().execute(query, params).fetchall()
+
+        result = []
+        for row in rows:
+            obj = cls(**json.loads(row[0]))
+            if all(getattr(obj, k) == v for k, v in attributes.items()):
+                result.append(obj)
+        return result
+
+    def search_before(self, cls: type, attribute: str, value,
+                      limit: int = None) -> List[TypeVar('Base')]:
+        """ Return the objects of `cls` whose `attribute` is lower than
+        `value`, lowest first, at most `limit` of them
+
+        Indexed attributes are matched in SQL, comparing their JSON
+        values; the others are compared on every built object.
+        """
+        sql = self._sql(cls)
+        if attribute not in sql['before'] or \
+                not isinstance(value, _BINDABLE):
+            objs = sorted((obj for obj in self.search(cls, {})
+                           if getattr(obj, attribute, None) is not None and
+                           getattr(obj, attribute) < value),
+                          key=lambda obj: getattr(obj, attribute))
+            return objs[:limit] if limit is not None else objs
+        rows = self._connection().execute(
+            sql['before'][attribute],
+            (value, -1 if limit is None else limit)).fetchall()
+        return [cls(**json.loads(row[0])) for row in rows]
+
+    def count(self, cls: type) -> int:
+        """ Return the number of stored objects of `cls`
+        """
+        return self._connection().execute(self._sql(cls)['count']
+                                          ).fetchone()[0]
+
+    def iter_json(self, cls: type) -> Iterator[dict]:
+        """ Yield the JSON dictionary of every stored object of `cls`,
+        reading the rows as they are consumed
+        """
+        for row in self._connection().execute(self._sql(cls)['all']):
+            yield json.loads(row[0])
+
+    def save(self, obj: TypeVar('Base')) -> None:
+        """ Insert or update `obj`
+        """
+        sql = self._sql(obj.__class__)
+        self._connection().execute(sql['insert'], self._row(sql, obj))
+
+    def save_many(self, cls: type, objs: List[TypeVar('Base')]) -> int:
+        """ Insert or update several objects of `cls` in one transaction
+        """
+        conn = self._connection()
+        sql = self._sql(cls)
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(sql['insert'],
+                             [self._row(sql, obj) for obj in objs])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return len(objs)
+
+    def remove(self, obj: TypeVar('Base')) -> None:
+        """ Delete `obj`
+        """
+        self._connection().execute(self._sql(obj.__class__)['delete'],
+                                   (obj.id,))
+
+    def remove_many(self, cls: type, objs: List[TypeVar('Base')]) -> int:
+        """ Delete several objects of `cls` in one transaction
+        """
+        conn = self._connection()
+        sql = self._sql(cls)
+        conn.execute("BEGIN")
+        try:
+            cursor = conn.executemany(sql['delete'],
+                                      [(obj.id,) for obj in objs])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount
+
+    @staticmethod
+    def _row(sql: dict, obj: TypeVar('Base')) -> Tuple:
+        """ Return the INSERT parameters of `obj`
+        """
+        data = obj.to_json(True)
+        values = [obj.id]
+        for column in sql['columns']:
+            value = data.get(column)
+            values.append(value if isinstance(value, _BINDABLE) else None)
+        values.append(json.dumps(data))
+        return tuple(values)
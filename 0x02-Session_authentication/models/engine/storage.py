@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+""" Storage module
+
+Interface of the storage engines `Base` can delegate to instead of its
+built-in `DATA` dictionary and JSON files.
+"""
+from typing import Iterator, List, TypeVar
+
+
+class Storage():
+    """ Storage engine interface
+
+    Every method receives the model class (or instance) it works on, so
+    one engine serves all the models.
+    """
+
+    def load(self, cls: type) -> None:
+        """ Prepare the storage of `cls` (create tables, ...)
+        """
+        raise NotImplementedError()
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ Return the object of `cls` with this ID, or None
+        """
+        raise NotImplementedError()
+
+    def search(self, cls: type,
+               attributes: dict) -> List[TypeVar('Base')]:
+        """ Return the objects of `cls` matching all `attributes`
+        """
+        raise NotImplementedError()
+
+    def search_before(self, cls: type, attribute: str, value,
+                      limit: int = None) -> List[TypeVar('Base')]:
+        """ Return the objects of `cls` whose `attribute` is lower than
+        `value`, lowest first, at most `limit` of them
+        """
+        raise NotImplementedError()
+
+    def count(self, cls: type) -> int:
+        """ Return the number of stored objects of `cls`
+        """
+        raise NotImplementedError()
+
+    def iter_json(self, cls: type) -> Iterator[dict]:
+        """ Yield the JSON dictionary of every stored object of `cls`
+        """
+        raise NotImplementedError()
+
+    def save(self, obj: TypeVar('Base')) -> None:
+        """ Insert or update `obj`
+        """
+        raise NotImplementedError()
+
+    def save_many(self, cls: type, objs: List[TypeVar('Base')]) -> int:
+        """ Insert or update several objects of `cls` at once, return how
+        many
+        """
+        raise NotImplementedError()
+
+    def remove(self, obj: TypeVar('Base')) -> None:
+        """ Delete `obj`
+        """
+        raise NotImplementedError()
+
+    def remove_many(self, cls: type, objs: List[TypeVar('Base')]) -> int:
+        """ Delete several objects of `cls` at once, return how many
+        existed
+        """
+        raise NotImplementedError()
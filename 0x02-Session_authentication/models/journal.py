@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+""" Journal module
+
+Append-only write-ahead journal of model changes. Each mutation is one
+JSON line; lines are fsynced in batches and a background thread folds
+the journal into a snapshot file from time to time.
+"""
+from os import path
+from typing import Callable, Iterator
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+
+FSYNC_BATCH = 64
+logger = logging.getLogger(__name__)
+
+
+class Journal():
+    """ Write-ahead journal of one model class
+
+    Crash safety: a record is durable once fsynced, which happens every
+    `FSYNC_BATCH` records or `fsync_interval` seconds, whichever is first.
+    Compaction rotates the journal aside, writes the snapshot to a
+    temporary file and atomically renames it over the old snapshot, so a
+    crash at any point leaves snapshot + journals replayable.
+
+    Errors of the background thread are logged and do not stop it: a
+    failed compaction is retried `compact_interval` seconds later.
+    """
+
+    def __init__(self, file_path: str, compact: Callable[[], None],
+                 fsync_interval: float = 0.05,
+                 compact_interval: float = 300):
+        """ Initialize a journal stored at `file_path`
+
+        `compact` is called from the background thread when the journal
+        is due for compaction; it is expected to call `rotate()` and then
+        `write_snapshot()`.
+        """
+        self.file_path = file_path
+        self.compacting_path = file_path + ".compacting"
+        self.lock = threading.RLock()
+        self.compaction_lock = threading.Lock()
+        self._compact = compact
+        self._fsync_interval = fsync_interval
+        self._compact_interval = compact_interval
+        self._file = None
+        self._pending = 0
+        self._records = 0
+        self._last_compaction = time.monotonic()
+        self._compaction_due = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def replay(self) -> Iterator[dict]:
+        """ Yield the records of the rotated and current journals
+
+        A torn last line (crash in the middle of a write) is dropped and
+        truncated away so new records are not appended after it. Records
+        still buffered by this process must be flushed first.
+        """
+        self._records = 0
+        for file_path in (self.compacting_path, self.file_path):
+            if not path.exists(file_path):
+                continue
+            with open(file_path, 'rb+') as f:
+                valid_size = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    valid_size += len(line)
+                    if file_path == self.file_path:
+                        self._records += 1
+                    yield record
+                f.truncate(valid_size)
+
+    def append(self, record: dict) -> None:
+        """ Append one record, fsyncing when the batch is full
+        """
+        line = json.dumps(record, separators=(',', ':')) + "\n"
+        with self.lock:
+            if self._file is None:
+                self._open()
+            self._file.write(line)
+            self._pending += 1
+            self._records += 1
+            if self._pending >= FSYNC_BATCH:
+                self._sync()
+
+    def flush(self) -> None:
+        """ Write and fsync all pending records
+        """
+        with self.lock:
+            if self._file is not None and self._pending > 0:
+                self._sync()
+
+    def rotate(self) -> None:
+        """ Move the current journal aside before a snapshot is written
+
+        Must be called with `lock` held, at the point the snapshot is
+        taken, so that the rotated journal holds exactly the records the
+        snapshot covers.
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if path.exists(self.file_path):
+            if path.exists(self.compacting_path):
+                with open(self.compacting_path, 'ab') as dst, \
+                        open(self.file_path, 'rb') as src:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.file_path)
+            else:
+                os.replace(self.file_path, self.compacting_path)
+        self._records = 0
+        self._last_compaction = time.monotonic()
+
+    def write_snapshot(self, snapshot_path: str, objs_json: dict) -> None:
+        """ Atomically replace the snapshot and drop the rotated journal
+        """
+        write_atomic(snapshot_path, objs_json)
+        if path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+
+    def close(self) -> None:
+        """ Stop the background thread and flush the journal
+        """
+        self._stop.set()
+        with self.lock:
+            self.flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self) -> None:
+        """ Open the journal for appending and start the flusher
+        """
+        self._file = open(self.file_path, 'a')
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _sync(self) -> None:
+        """ Flush Python buffers and fsync the journal file
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def _run(self) -> None:
+        """ Background loop: periodic fsync and compaction
+        """
+        while not self._stop.wait(self._fsync_interval):
+            try:
+                self.flush()
+                elapsed = time.monotonic() - self._last_compaction
+                if (self._records > 0 or self._compaction_due) and \
+                        elapsed >= self._compact_interval:
+                    self._compaction_due = True
+                    self._compact()
+                    self._compaction_due = False
+            except Exception:
+                logger.exception("%s: background flush or compaction "
+                                 "failed", self.file_path)
+                self._last_compaction = time.monotonic()
+
+
+def write_atomic(file_path: str, objs_json: dict) -> None:
+    """ Write `objs_json` to `file_path` through a fsynced temporary file
+    """
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(objs_json, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    dir_fd = os.open(path.dirname(path.abspath(file_path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
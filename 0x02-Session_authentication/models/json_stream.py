@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+""" JSON stream module
+
+Incremental reader for the `.db_<Class>.json` files: yields the members
+of the top-level JSON object one at a time instead of decoding the whole
+file at once, so memory stays bounded by the read buffer and the largest
+single member.
+"""
+from typing import IO, Iterator, Tuple
+import json
+import re
+
+
+CHUNK_SIZE = 1 << 16
+_OPEN = re.compile(r'[ \t\n\r]*\{[ \t\n\r]*')
+_MEMBER = re.compile(r'"((?:[^"\\]|\\.)*)"[ \t\n\r]*:[ \t\n\r]*')
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,}])[ \t\n\r]*')
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_items(f: IO[str], chunk_size: int = CHUNK_SIZE,
+                    with_text: bool = False) -> Iterator[Tuple]:
+    """ Yield the (key, value) pairs of the JSON object read from `f`,
+    or (key, value, text) triples with the source text of each value if
+    `with_text`
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        """ Append the next chunk to the buffer, False at end of file
+        """
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def match(pattern: re.Pattern, expecting: str) -> re.Match:
+        """ Match `pattern` at the current position, reading more input
+        while the match could still extend past the end of the buffer
+        """
+        while True:
+            m = pattern.match(buf, pos)
+            if (m is None or m.end() == len(buf)) and fill():
+                continue
+            if m is None:
+                raise json.JSONDecodeError(
+                    "Expecting {}".format(expecting), buf, pos)
+            return m
+
+    while buf.strip() == "":
+        if not fill():
+            return
+    pos = match(_OPEN, "'{'").end()
+    if buf.startswith("}", pos):
+        return
+    while True:
+        m = match(_MEMBER, "property name")
+        key = m.group(1)
+        if "\\" in key:
+            key = json.loads('"' + key + '"')
+        pos = m.end()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not fill():
+                    raise
+                continue
+            # a number cut by the buffer end ("1." of "1.5") still decodes:
+            # only trust it once the character after it has been seen
+            if (end == len(buf) or buf[end] in _NUMBER_CHARS) and fill():
+                continue
+            break
+        if with_text:
+            yield key, value, buf[pos:end]
+        else:
+            yield key, value
+        pos = end
+        m = match(_SEPARATOR, "',' or '}'")
+        pos = m.end()
+        if m.group(1) == "}":
+            return
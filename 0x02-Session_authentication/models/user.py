@@ -1,14 +1,34 @@
 #!/usr/bin/env python3
 """ User module
+
+Passwords are stored as `pbkdf2_sha256$<iterations>$<salt>$<hash>`.
+Unsalted SHA-256 hex digests of earlier versions are still accepted,
+and replaced by the current format on the next successful check.
 """
 import hashlib
-from models.base import Base
+import hmac
+import os
+import secrets
+from models.base import Base, COMPACT_MODELS
+from models.cache import TTLCache
+
+
+PBKDF2_ALGORITHM = 'pbkdf2_sha256'
+PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 310000))
 
 
 class User(Base):
     """ User class
     """
 
+    indexed_attributes = ('email',)
+    verified_cache = TTLCache(
+        maxsize=int(os.getenv('PASSWORD_VERIFY_CACHE_SIZE', 10000)),
+        ttl=float(os.getenv('PASSWORD_VERIFY_CACHE_TTL', 300)))
+    _verify_key = secrets.token_bytes(32)
+    if COMPACT_MODELS:
+        __slots__ = ('email', '_password', 'first_name', 'last_name')
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
         """
@@ -26,22 +46,79 @@ class User(Base):
 
     @password.setter
     def password(self, pwd: str):
-        """ Setter of a new password: encrypt in SHA256
+        """ Setter of a new password: derive it with PBKDF2-SHA256
         """
         if pwd is None or type(pwd) is not str:
             self._password = None
         else:
-            self._password = hashlib.sha256(pwd.encode()).hexdigest().lower()
+            self._password = self.hash_password(pwd)
+
+    @staticmethod
+    def hash_password(pwd: str, iterations: int = None,
+                      salt: str = None) -> str:
+        """ Return the versioned PBKDF2-SHA256 hash of a password
+        """
+        if iterations is None:
+            iterations = PBKDF2_ITERATIONS
+        if salt is None:
+            salt = secrets.token_hex(16)
+        digest = hashlib.pbkdf2_hmac('sha256', pwd.encode(), salt.encode(),
+                                     iterations)
+        return '{}${}${}${}'.format(PBKDF2_ALGORITHM, iterations, salt,
+                                    digest.hex())
+
+    def needs_rehash(self) -> bool:
+        """ Tell whether the stored hash is legacy SHA-256 or uses other
+        PBKDF2 iterations than the current ones
+        """
+        if self.password is None:
+            return False
+        parts = self.password.split('$')
+        return len(parts) != 4 or parts[0] != PBKDF2_ALGORITHM or \
+            parts[1] != str(PBKDF2_ITERATIONS)
 
     def is_valid_password(self, pwd: str) -> bool:
         """ Validate a password
+
+        Successful checks are remembered in `verified_cache`, keyed by a
+        keyed hash of the stored hash and the password, so repeated
+        checks (Basic auth verifies on every request) skip the KDF; a
+        password change changes the key. A valid password stored in an
+        outdated format is rehashed and saved.
         """
         if pwd is None or type(pwd) is not str:
             return False
         if self.password is None:
             return False
-        pwd_e = pwd.encode()
-        return hashlib.sha256(pwd_e).hexdigest().lower() == self.password
+        if self.verified_cache.get(self._verified_key(pwd)):
+            return True
+
+        parts = self.password.split('$')
+        if len(parts) == 4 and parts[0] == PBKDF2_ALGORITHM:
+            try:
+                iterations = int(parts[1])
+            except ValueError:
+                return False
+            expected = self.hash_password(pwd, iterations, parts[2])
+        elif len(parts) == 1:
+            expected = hashlib.sha256(pwd.encode()).hexdigest().lower()
+        else:
+            return False
+        if not hmac.compare_digest(expected.encode(), self.password.encode()):
+            return False
+
+        if self.needs_rehash():
+            self.password = pwd
+            self.save()
+        self.verified_cache.set(self._verified_key(pwd), True)
+        return True
+
+    def _verified_key(self, pwd: str) -> bytes:
+        """ Return the `verified_cache` key of the stored hash and `pwd`
+        """
+        return hmac.new(self._verify_key,
+                        '{}\0{}'.format(self.password, pwd).encode(),
+                        hashlib.sha256).digest()
 
     def display_name(self) -> str:
         """ Display User name based on email/first_name/last_name
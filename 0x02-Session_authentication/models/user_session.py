@@ -4,7 +4,7 @@ User Session module for handling user sessions stored in a file
 
 """
 
-from models.base import Base
+from models.base import Base, COMPACT_MODELS
 
 
 class UserSession(Base):
@@ -13,6 +13,11 @@ class UserSession(Base):
 
     """
 
+    indexed_attributes = ('session_id', 'created_at')
+    sorted_attributes = ('created_at',)
+    if COMPACT_MODELS:
+        __slots__ = ('user_id', 'session_id')
+
     def __init__(self, *args: list, **kwargs: dict):
         """
         Initialize the UserSession class
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+""" Journal persistence tests
+
+Run from the project root: python3 -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(code: str, cwd: str) -> str:
+    """ Run `code` in a fresh interpreter with DB_JOURNAL=1
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT, DB_JOURNAL="1")
+    return subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                          check=True, capture_output=True,
+                          text=True).stdout.strip()
+
+
+class TestJournalReload(unittest.TestCase):
+    """ Reloading in journal mode keeps the records not yet flushed
+    """
+
+    def test_reload_after_save(self):
+        """ save, load_from_file then save_to_file loses nothing
+        """
+        with tempfile.TemporaryDirectory() as cwd:
+            out = run(
+                "from models.user_session import UserSession\n"
+                "UserSession.load_from_file()\n"
+                "for i in range(10):\n"
+                "    UserSession(user_id='u', session_id=str(i)).save()\n"
+                "UserSession.load_from_file()\n"
+                "print(UserSession.count())\n"
+                "UserSession.save_to_file()\n", cwd)
+            self.assertEqual(out, "10")
+            out = run(
+                "from models.user_session import UserSession\n"
+                "UserSession.load_from_file()\n"
+                "print(UserSession.count())\n", cwd)
+            self.assertEqual(out, "10")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,23 @@ app = Flask(__name__)
 AUTH = Auth()
 
 
+@app.after_request
+def sweep_expired_sessions(response):
+    """Deletes a batch of expired sessions and reset tokens when a sweep
+    is due
+    """
+    AUTH.sweep_expired_sessions()
+    AUTH.sweep_expired_reset_tokens()
+    return response
+
+
+@app.teardown_appcontext
+def remove_session(exception: BaseException = None) -> None:
+    """Releases the database session of the request
+    """
+    AUTH.release_db_session()
+
+
 @app.route('/', methods=['GET'])
 def index() -> str:
     """Index route that returns welcome msg
@@ -51,11 +68,11 @@ def logout() -> str:
     if not session_id:
         abort(403)
 
-    user = AUTH.get_user_from_session_id(session_id)
+    user = AUTH.get_session_user(session_id)
     if not user:
         abort(403)
 
-    AUTH.destroy_session(user.id)
+    AUTH.destroy_session(user.id, session_id)
     return redirect(url_for('index'))
 
 
@@ -65,13 +82,20 @@ def profile() -> str:
     if not session_id:
         abort(403)
 
-    user = AUTH.get_user_from_session_id(session_id)
+    user = AUTH.get_session_user(session_id)
     if not user:
         abort(403)
 
     return jsonify({"email": user.email}), 200
 
 
+@app.route('/stats', methods=['GET'])
+def stats() -> str:
+    """Returns the session cache size and hit rate
+    """
+    return jsonify({"session_cache": AUTH.session_cache.stats()}), 200
+
+
 @app.route("/reset_password", methods=["POST"])
 def get_reset_password_token() -> str:
     email = request.form.get("email")
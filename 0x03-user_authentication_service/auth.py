@@ -1,19 +1,31 @@
 #!/usr/bin/env python3
 """Auth module
 """
-import bcrypt
+from datetime import datetime, timedelta
+import hashlib
+import os
+import threading
+import time
 import uuid
+from typing import Iterable, List, NamedTuple, Tuple
+from cache import TTLCache
 from db import DB
+from password_hasher import get_hasher
 from user import User
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
 
 def _hash_password(password: str) -> bytes:
-    """Hash password using bcrypt
+    """Hash password using bcrypt, on the shared hasher pool
     """
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed
+    return get_hasher().hash(password)
+
+
+def _hash_token(token: str) -> str:
+    """Hash a random token for storage and lookup
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
 
 
 def _generate_uuid() -> str:
@@ -22,84 +34,283 @@ def _generate_uuid() -> str:
     return str(uuid.uuid4())
 
 
+class UserSnapshot(NamedTuple):
+    """Lightweight, read-only view of a logged in user
+    """
+    id: int
+    email: str
+    expires_at: datetime
+
+
+class BulkRegistration(NamedTuple):
+    """Outcome of Auth.register_users: the number of users created and
+    an (index, email, reason) tuple per rejected row
+    """
+    created: int
+    failures: List[Tuple[int, str, str]]
+
+
 class Auth:
     """Auth class to interact with the authentication database.
+
+    `session_cache` maps session IDs to a UserSnapshot of their user for
+    USER_AUTH_SESSION_CACHE_TTL seconds (default 60), bounded to
+    USER_AUTH_SESSION_CACHE_SIZE entries (default 10000). Entries are
+    invalidated explicitly when sessions or passwords change in this
+    process; the TTL bounds how long other processes may serve them.
+
+    A user may hold up to USER_AUTH_MAX_SESSIONS sessions (default 5,
+    0 for no limit), each lasting USER_AUTH_SESSION_DURATION seconds
+    (default 86400). Expired sessions are deleted by
+    sweep_expired_sessions, USER_AUTH_SESSION_SWEEP_BATCH rows (default
+    1000) at a time, at most every USER_AUTH_SESSION_SWEEP_INTERVAL
+    seconds (default 60) unless a backlog remains.
+
+    Reset tokens are stored as SHA-256 hashes, expire after
+    USER_AUTH_RESET_TOKEN_TTL seconds (default 3600) and are swept
+    like sessions by sweep_expired_reset_tokens.
     """
     def __init__(self):
         self._db = DB()
+        self._hasher = get_hasher()
+        self.session_cache = TTLCache(
+            maxsize=int(os.getenv('USER_AUTH_SESSION_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('USER_AUTH_SESSION_CACHE_TTL', 60)))
+        self.session_duration = timedelta(
+            seconds=int(os.getenv('USER_AUTH_SESSION_DURATION', 86400)))
+        self.max_sessions = int(os.getenv('USER_AUTH_MAX_SESSIONS', 5))
+        self.sweep_batch = int(
+            os.getenv('USER_AUTH_SESSION_SWEEP_BATCH', 1000))
+        self.sweep_interval = float(
+            os.getenv('USER_AUTH_SESSION_SWEEP_INTERVAL', 60))
+        self.reset_token_ttl = timedelta(
+            seconds=int(os.getenv('USER_AUTH_RESET_TOKEN_TTL', 3600)))
+        self._next_sweep = {}
+        self._sweep_lock = threading.Lock()
 
     def register_user(self, email: str, password: str) -> User:
         """Register user
+
+        The unique index on email rejects a duplicate, even one inserted
+        concurrently.
         """
+        hashed_password = _hash_password(password)
         try:
-            self._db.find_user_by(email=email)
+            return self._db.add_user(email, hashed_password.decode('utf-8'))
+        except IntegrityError:
             raise ValueError(f"User {email} already exists")
-        except NoResultFound:
-            hashed_password = _hash_password(password)
-            user = self._db.add_user(email, hashed_password.decode('utf-8'))
-            return user
+
+    def register_users(self, users: Iterable[Tuple[str, str]],
+                       chunk_size: int = 1000) -> BulkRegistration:
+        """Register many (email, password) users
+
+        Each chunk of chunk_size rows is checked for registered emails
+        with one set-based query, hashed in parallel on the hasher pool
+        and inserted with one executemany in its own transaction. Rows
+        with a missing field, an email seen earlier in the import or an
+        email already registered are reported as failures; a chunk that
+        hits a concurrent registration is retried row by row.
+        """
+        created, failures, seen = 0, [], set()
+        chunk = []
+        for index, (email, password) in enumerate(users):
+            if not email or not password or not isinstance(email, str) \
+                    or not isinstance(password, str):
+                failures.append((index, email, "missing email or password"))
+            elif email in seen:
+                failures.append((index, email, "duplicate email in import"))
+            else:
+                seen.add(email)
+                chunk.append((index, email, password))
+            if len(chunk) >= chunk_size:
+                created += self._register_chunk(chunk, failures)
+                chunk = []
+        created += self._register_chunk(chunk, failures)
+        failures.sort()
+        return BulkRegistration(created, failures)
+
+    def _register_chunk(self, chunk: List[Tuple[int, str, str]],
+                        failures: List[Tuple[int, str, str]]) -> int:
+        """Register one chunk of register_users, appending its failures
+        """
+        existing = self._db.find_existing_emails(
+            email for _, email, _ in chunk)
+        rows = []
+        for index, email, password in chunk:
+            if email in existing:
+                failures.append((index, email, "already exists"))
+            else:
+                rows.append((index, email, password))
+        hashed = self._hasher.hash_many(password for _, _, password in rows)
+        users = [(email, hashed_password.decode('utf-8'))
+                 for (_, email, _), hashed_password in zip(rows, hashed)]
+        try:
+            self._db.add_users(users)
+            return len(users)
+        except IntegrityError:
+            pass
+        created = 0
+        for (index, email, _), user in zip(rows, users):
+            try:
+                self._db.add_users([user])
+                created += 1
+            except IntegrityError:
+                failures.append((index, email, "already exists"))
+        return created
 
     def valid_login(self, email: str, password: str) -> bool:
         """Check if provided email with password combination is valid
+
+        A valid password hashed at another cost than the current one is
+        rehashed and stored.
         """
         try:
             user = self._db.find_user_by(email=email)
-            hashed_password = user.hashed_password.encode('utf-8')
-            return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
         except NoResultFound:
             return False
+        hashed_password = user.hashed_password.encode('utf-8')
+        if not self._hasher.verify(hashed_password, password):
+            return False
+        if self._hasher.needs_rehash(hashed_password):
+            self._db.update_user(
+                user.id,
+                hashed_password=self._hasher.hash(password).decode('utf-8'))
+        return True
 
     def create_session(self, email: str) -> str:
         """Create a new session id for the user with the email
+
+        The user's oldest sessions beyond max_sessions are removed.
         """
         try:
             user = self._db.find_user_by(email=email)
-            session_id = _generate_uuid()
-            user.session_id = session_id
-            self._db.session.commit()
-            return session_id
         except NoResultFound:
             return None
+        session_id = _generate_uuid()
+        removed = self._db.add_session(
+            user.id, session_id, datetime.utcnow() + self.session_duration,
+            self.max_sessions)
+        for old_session_id in removed:
+            self.session_cache.pop(old_session_id)
+        return session_id
 
     def get_user_from_session_id(self, session_id: str) -> User:
-        """Get a user from a session_id
+        """Get the user of a live session_id
         """
         if session_id is None:
             return None
 
         try:
-            user = self._db.find_user_by(session_id=session_id)
+            user, _ = self._db.find_user_by_session(session_id,
+                                                    datetime.utcnow())
             return user
         except NoResultFound:
             return None
 
-    def destroy_session(self, user_id: int) -> None:
-        """Destroy a user's session by setting their session_id to None
+    def get_session_user(self, session_id: str) -> UserSnapshot:
+        """Get a snapshot of the user of a live session_id, from the
+        session cache when possible
         """
-        try:
-            user = self._db.find_user_by(id=user_id)
-            user.session_id = None
-            self._db.session.commit()
-        except NoResultFound:
+        if session_id is None:
+            return None
+
+        now = datetime.utcnow()
+        snapshot = self.session_cache.get(session_id)
+        if snapshot is None:
+            try:
+                user, expires_at = self._db.find_user_by_session(session_id,
+                                                                 now)
+            except NoResultFound:
+                return None
+            snapshot = UserSnapshot(user.id, user.email, expires_at)
+            self.session_cache.set(session_id, snapshot)
+        if snapshot.expires_at <= now:
+            self.session_cache.pop(session_id)
             return None
+        return snapshot
+
+    def destroy_session(self, user_id: int, session_id: str = None) -> None:
+        """Destroy one session of a user, or all of them when session_id
+        is None
+        """
+        for removed in self._db.remove_sessions(user_id, session_id):
+            self.session_cache.pop(removed)
+
+    def sweep_expired_sessions(self) -> int:
+        """Delete one batch of expired sessions when a sweep is due
+
+        Returns the number of sessions deleted.
+        """
+        removed = self._sweep('sessions', self._db.remove_expired_sessions)
+        for session_id in removed:
+            self.session_cache.pop(session_id)
+        return len(removed)
+
+    def sweep_expired_reset_tokens(self) -> int:
+        """Clear one batch of expired reset tokens when a sweep is due
+
+        Returns the number of tokens cleared.
+        """
+        return len(self._sweep('reset_tokens',
+                               self._db.clear_expired_reset_tokens))
+
+    def release_db_session(self) -> None:
+        """Close the database session of the current thread, e.g. at the
+        end of a request
+        """
+        self._db.remove_session()
+
+    def _sweep(self, kind: str, remove) -> list:
+        """Run remove(now, sweep_batch) if a sweep of kind is due
+
+        A sweep is due every sweep_interval seconds, and right away
+        while the previous batch came back full. Returns the list remove
+        returned, empty when no sweep ran.
+        """
+        if time.monotonic() < self._next_sweep.get(kind, 0.0) or \
+                not self._sweep_lock.acquire(blocking=False):
+            return []
+        try:
+            removed = remove(datetime.utcnow(), self.sweep_batch)
+            if len(removed) < self.sweep_batch:
+                self._next_sweep[kind] = \
+                    time.monotonic() + self.sweep_interval
+        finally:
+            self._sweep_lock.release()
+        return removed
 
     def get_reset_password_token(self, email: str) -> str:
-        """Generate a password reset token for the user"""
+        """Generate a password reset token for the user
+
+        Only the hash of the token is stored, with its expiry.
+        """
         try:
             user = self._db.find_user_by(email=email)
             reset_token = _generate_uuid()
-            self._db.update_user(user.id, reset_token=reset_token)
+            self._db.update_user(
+                user.id, reset_token=_hash_token(reset_token),
+                reset_token_expires_at=datetime.utcnow() +
+                self.reset_token_ttl)
             return reset_token
         except NoResultFound:
             raise ValueError(f"User {email} does not exist")
 
     def update_password(self, reset_token: str, password: str) -> None:
-        """Update a user's password using a reset token."""
+        """Update a user's password using a reset token.
+
+        The token is consumed by the same UPDATE that stores the new
+        password, and only while it is live, so it works at most once.
+        """
+        if reset_token is None or password is None:
+            raise ValueError("Invalid reset token")
+        token_hash = _hash_token(reset_token)
         try:
-            user = self._db.find_user_by(reset_token=reset_token)
-            hashed_password = _hash_password(password)
-            self._db.update_user(user.id,
-                                 hashed_password=hashed_password.decode('utf-8'),
-                                 reset_token=None)
+            user = self._db.find_user_by(reset_token=token_hash)
         except NoResultFound:
             raise ValueError("Invalid reset token")
+        hashed_password = _hash_password(password).decode('utf-8')
+        if not self._db.consume_reset_token(token_hash, datetime.utcnow(),
+                                            hashed_password=hashed_password):
+            raise ValueError("Invalid reset token")
+        for session_id in self._db.find_session_ids(user.id):
+            self.session_cache.pop(session_id)
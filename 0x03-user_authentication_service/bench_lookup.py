@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Lookup-latency benchmark of the users table indexes
+
+Usage: ./bench_lookup.py [users] [lookups]
+
+Fills a temporary SQLite database with the former, unindexed users
+table and times the lookup query on email, session_id and reset_token
+with plain sqlite3 (the User model no longer matches that table). It
+then lets DB migrate the database (USER_AUTH_DB_KEEP=1) and times the
+same query on the indexed table, and DB.find_user_by.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Callable
+
+
+def fill(path: str, count: int) -> None:
+    """Create the unindexed users table with `count` users
+    """
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users (id INTEGER NOT NULL, "
+                 "email VARCHAR(250) NOT NULL, "
+                 "hashed_password VARCHAR(250) NOT NULL, "
+                 "session_id VARCHAR(250), reset_token VARCHAR(250), "
+                 "PRIMARY KEY (id))")
+    conn.executemany(
+        "INSERT INTO users (email, hashed_password, session_id, "
+        "reset_token) VALUES (?, ?, ?, ?)",
+        (("user{}@example.com".format(i), "x" * 60,
+          "session-{}".format(i), "token-{}".format(i))
+         for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def sql_finder(path: str) -> Callable:
+    """Return find(column, value), querying the users table with sqlite3
+    """
+    conn = sqlite3.connect(path)
+
+    def find(column: str, value: str) -> tuple:
+        """Return the first user whose column equals value
+        """
+        return conn.execute(
+            "SELECT * FROM users WHERE {} = ? LIMIT 1".format(column),
+            (value,)).fetchone()
+    return find
+
+
+def time_lookups(find: Callable, count: int, lookups: int) -> None:
+    """Print the mean latency of find(column, value) on each lookup
+    column
+    """
+    for column, value in (("email", "user{}@example.com"),
+                          ("session_id", "session-{}"),
+                          ("reset_token", "token-{}")):
+        keys = [value.format(random.randrange(count))
+                for _ in range(lookups)]
+        start = time.perf_counter()
+        for key in keys:
+            find(column, key)
+        elapsed = time.perf_counter() - start
+        print("  {:12} {:10.1f} us/lookup".format(
+            column, elapsed / lookups * 1e6))
+
+
+def main() -> None:
+    """Time the lookups before and after the migration
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    path = os.path.join(tempfile.mkdtemp(), "users.db")
+    os.environ["USER_AUTH_DB_URL"] = "sqlite:///" + path
+    os.environ["USER_AUTH_DB_KEEP"] = "1"
+
+    from db import DB
+
+    start = time.perf_counter()
+    fill(path, count)
+    print("{} users written in {:.1f} s".format(
+        count, time.perf_counter() - start))
+
+    print("unindexed, sqlite3")
+    time_lookups(sql_finder(path), count, lookups)
+
+    start = time.perf_counter()
+    db = DB()
+    print("migrated in {:.1f} s".format(time.perf_counter() - start))
+    print("indexed, sqlite3")
+    time_lookups(sql_finder(path), count, lookups * 100)
+    print("indexed, DB.find_user_by")
+    time_lookups(lambda column, value: db.find_user_by(**{column: value}),
+                 count, lookups * 100)
+    db.remove_session()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""Throughput benchmark of bulk user registration
+
+Usage: ./bench_register.py [users] [rounds]
+
+Registers `users` users in a temporary SQLite database one at a time
+with Auth.register_user, then in a fresh database with
+Auth.register_users, and prints the users per second of each. Passwords
+are hashed at bcrypt cost `rounds` (default 4) so that the database path
+is visible; at production costs both are bound by bcrypt, which
+register_users spreads over PASSWORD_HASH_WORKERS threads.
+"""
+import os
+import sys
+import tempfile
+import time
+
+
+def main() -> None:
+    """Time both registration paths and print their rates
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    os.environ["PASSWORD_HASH_ROUNDS"] = sys.argv[2] \
+        if len(sys.argv) > 2 else "4"
+    os.chdir(tempfile.mkdtemp())
+    from auth import Auth
+
+    users = [("user{}@example.com".format(i), "pwd{}".format(i))
+             for i in range(count)]
+    auth = Auth()
+    start = time.perf_counter()
+    for email, password in users:
+        auth.register_user(email, password)
+    elapsed = time.perf_counter() - start
+    print("register_user  {:10.0f} users/sec".format(count / elapsed))
+
+    auth = Auth()
+    rows = users + [users[0], ("", "pwd")]
+    start = time.perf_counter()
+    result = auth.register_users(rows)
+    elapsed = time.perf_counter() - start
+    assert result.created == count and len(result.failures) == 2
+    print("register_users {:10.0f} users/sec".format(count / elapsed))
+    print("failures: {}".format(result.failures))
+    assert not auth.register_users(users[:10]).created
+
+
+if __name__ == "__main__":
+    main()
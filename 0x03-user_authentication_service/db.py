@@ -1,14 +1,20 @@
 #!/usr/bin/env python3
 """DB module
 """
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from datetime import datetime
+import os
+from typing import Iterable, List, Set, Tuple
+from sqlalchemy import create_engine, event, insert, inspect, or_
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.session import Session
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.exc import IntegrityError, InvalidRequestError
 
 
-from user import Base, User
+from user import Base, User, UserSession
 
 
 class DB:
@@ -17,29 +23,142 @@ class DB:
 
     def __init__(self) -> None:
         """Initialize a new DB instance
+
+        The database is USER_AUTH_DB_URL (default sqlite:///a.db). It is
+        dropped and recreated unless USER_AUTH_DB_KEEP=1, in which case
+        only missing tables and indexes are created.
         """
-        self._engine = create_engine("sqlite:///a.db", echo=False)
-        Base.metadata.drop_all(self._engine)
+        self._engine = self._create_engine(
+            os.getenv("USER_AUTH_DB_URL", "sqlite:///a.db"))
+        if os.getenv("USER_AUTH_DB_KEEP", "0") != "1":
+            Base.metadata.drop_all(self._engine)
         Base.metadata.create_all(self._engine)
-        self.__session = None
+        self._migrate()
+        self.__session = scoped_session(sessionmaker(bind=self._engine))
+
+    @staticmethod
+    def _create_engine(url: str) -> Engine:
+        """Create the engine with a connection pool shared by threads
+
+        Connections are checked with a ping on checkout. File and server
+        databases get USER_AUTH_DB_POOL_SIZE (default 5) pooled
+        connections plus USER_AUTH_DB_MAX_OVERFLOW (default 10), recycled
+        after USER_AUTH_DB_POOL_RECYCLE seconds (default 1800). SQLite
+        connections enforce foreign keys, so that removing a user
+        cascades to its sessions.
+        """
+        options = {"echo": False, "pool_pre_ping": True}
+        url = make_url(url)
+        if url.get_backend_name() != "sqlite":
+            return create_engine(url, **DB._pool_options(options))
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            options["poolclass"] = StaticPool
+        else:
+            options["poolclass"] = QueuePool
+            options = DB._pool_options(options)
+        engine = create_engine(url, **options)
+        event.listen(engine, "connect", DB._enable_foreign_keys)
+        return engine
+
+    @staticmethod
+    def _pool_options(options: dict) -> dict:
+        """Add the connection pool sizes to the engine options
+        """
+        options["pool_size"] = int(os.getenv("USER_AUTH_DB_POOL_SIZE", 5))
+        options["max_overflow"] = int(
+            os.getenv("USER_AUTH_DB_MAX_OVERFLOW", 10))
+        options["pool_recycle"] = int(
+            os.getenv("USER_AUTH_DB_POOL_RECYCLE", 1800))
+        return options
+
+    @staticmethod
+    def _enable_foreign_keys(dbapi_connection, connection_record) -> None:
+        """Turn on foreign key enforcement on a new SQLite connection
+        """
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    def _migrate(self) -> None:
+        """Add the columns and indexes declared on the models but missing
+        from tables made by earlier versions
+
+        Missing columns are added with ALTER TABLE, so they must be
+        nullable or have a server default. A unique index fails to build
+        while duplicates remain; the IntegrityError is raised so they can
+        be resolved first.
+        """
+        inspector = inspect(self._engine)
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"]
+                       for column in inspector.get_columns(table.name)}
+            with self._engine.begin() as conn:
+                for column in table.columns:
+                    if column.name in columns:
+                        continue
+                    conn.exec_driver_sql("ALTER TABLE {} ADD COLUMN {}".format(
+                        table.name, CreateColumn(column).compile(
+                            dialect=self._engine.dialect)))
+            existing = {index["name"]
+                        for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(self._engine)
 
     @property
     def session(self) -> Session:
-        """Memoized session object
+        """Session of the current thread, created on first use
         """
-        if self.__session is None:
-            DBSession = sessionmaker(bind=self._engine)
-            self.__session = DBSession()
-        return self.__session
+        return self.__session()
+
+    def remove_session(self) -> None:
+        """Close the session of the current thread and release its
+        connection to the pool
+        """
+        self.__session.remove()
 
     def add_user(self, email: str, hashed_password: str) -> User:
         """Create and store a new user
         """
         user = User(email=email, hashed_password=hashed_password)
         self.session.add(user)
-        self.session.commit()
+        try:
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise
         return user
 
+    def find_existing_emails(self, emails: Iterable[str],
+                             batch_size: int = 500) -> Set[str]:
+        """Return which of emails are already registered, with one
+        SELECT ... WHERE email IN per batch_size emails
+        """
+        emails = list(emails)
+        existing = set()
+        for start in range(0, len(emails), batch_size):
+            existing.update(
+                row.email for row in self.session.query(User.email)
+                .filter(User.email.in_(emails[start:start + batch_size])))
+        return existing
+
+    def add_users(self, users: List[Tuple[str, str]]) -> None:
+        """Insert (email, hashed_password) rows in one transaction, as a
+        single executemany INSERT
+        """
+        if not users:
+            return
+        try:
+            self.session.execute(
+                insert(User.__table__),
+                [{"email": email, "hashed_password": hashed_password}
+                 for email, hashed_password in users])
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise
+
     def find_user_by(self, **kwargs) -> User:
         """Return a filtered user
         """
@@ -63,3 +182,110 @@ class DB:
                 raise ValueError(f"Invalid attribute: {key}")
             setattr(user, key, value)
         session.commit()
+
+    def add_session(self, user_id: int, session_id: str,
+                    expires_at: datetime, max_sessions: int) -> List[str]:
+        """Store a new session of a user, removing the oldest ones beyond
+        max_sessions (no limit when 0); returns the removed session ids
+        """
+        session = self.session
+        session.add(UserSession(user_id=user_id, session_id=session_id,
+                                created_at=datetime.utcnow(),
+                                expires_at=expires_at))
+        removed = []
+        if max_sessions > 0:
+            removed = session.query(UserSession.id, UserSession.session_id)\
+                .filter(UserSession.user_id == user_id)\
+                .order_by(UserSession.created_at.desc(),
+                          UserSession.id.desc())\
+                .offset(max_sessions).all()
+            if removed:
+                session.query(UserSession)\
+                    .filter(UserSession.id.in_([row.id for row in removed]))\
+                    .delete(synchronize_session=False)
+        session.commit()
+        return [row.session_id for row in removed]
+
+    def find_user_by_session(self, session_id: str,
+                             now: datetime) -> Tuple[User, datetime]:
+        """Return the user of a live session and the session expiry, in
+        one indexed join
+        """
+        try:
+            return self.session.query(User, UserSession.expires_at)\
+                .join(UserSession, UserSession.user_id == User.id)\
+                .filter(UserSession.session_id == session_id,
+                        UserSession.expires_at > now).one()
+        except NoResultFound:
+            raise NoResultFound("No live session with this session_id.")
+
+    def find_session_ids(self, user_id: int) -> List[str]:
+        """Return the session ids of a user
+        """
+        return [row.session_id for row in
+                self.session.query(UserSession.session_id)
+                .filter(UserSession.user_id == user_id)]
+
+    def remove_sessions(self, user_id: int,
+                        session_id: str = None) -> List[str]:
+        """Remove one session of a user, or all of them when session_id
+        is None; returns the removed session ids
+        """
+        query = self.session.query(UserSession)\
+            .filter(UserSession.user_id == user_id)
+        if session_id is not None:
+            query = query.filter(UserSession.session_id == session_id)
+        removed = [row.session_id
+                   for row in query.with_entities(UserSession.session_id)]
+        query.delete(synchronize_session=False)
+        self.session.commit()
+        return removed
+
+    def remove_expired_sessions(self, now: datetime,
+                                batch_size: int) -> List[str]:
+        """Remove up to batch_size sessions expired at now with a single
+        DELETE; returns their session ids
+        """
+        session = self.session
+        expired = session.query(UserSession.id, UserSession.session_id)\
+            .filter(UserSession.expires_at <= now)\
+            .order_by(UserSession.expires_at).limit(batch_size).all()
+        if expired:
+            session.query(UserSession)\
+                .filter(UserSession.id.in_([row.id for row in expired]))\
+                .delete(synchronize_session=False)
+        session.commit()
+        return [row.session_id for row in expired]
+
+    def consume_reset_token(self, token_hash: str, now: datetime,
+                            **kwargs) -> bool:
+        """Clear a live reset token and apply kwargs to its user in a
+        single UPDATE, so that a token is only ever used once
+        """
+        updated = self.session.query(User)\
+            .filter(User.reset_token == token_hash,
+                    User.reset_token_expires_at > now)\
+            .update(dict(kwargs, reset_token=None,
+                         reset_token_expires_at=None),
+                    synchronize_session=False)
+        self.session.commit()
+        return updated == 1
+
+    def clear_expired_reset_tokens(self, now: datetime,
+                                   batch_size: int) -> List[int]:
+        """Clear up to batch_size reset tokens expired at now, or stored
+        without an expiry by earlier versions; returns the user ids
+        """
+        session = self.session
+        expired = [row.id for row in session.query(User.id)
+                   .filter(User.reset_token.isnot(None),
+                           or_(User.reset_token_expires_at <= now,
+                               User.reset_token_expires_at.is_(None)))
+                   .limit(batch_size)]
+        if expired:
+            session.query(User).filter(User.id.in_(expired))\
+                .update({User.reset_token: None,
+                         User.reset_token_expires_at: None},
+                        synchronize_session=False)
+        session.commit()
+        return expired
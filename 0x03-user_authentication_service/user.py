@@ -3,7 +3,7 @@
 This module describes models for user authentication
 
 """
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 # Create a new instance of declarative_base
@@ -15,7 +15,23 @@ class User(Base):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True)
-    email = Column(String(250), nullable=False)
+    email = Column(String(250), nullable=False, unique=True, index=True)
     hashed_password = Column(String(250), nullable=False)
-    session_id = Column(String(250), nullable=True)
-    reset_token = Column(String(250), nullable=True)
+    # single-session column of the original schema; sessions now live
+    # in the sessions table and this column is no longer written
+    session_id = Column(String(250), nullable=True, index=True)
+    reset_token = Column(String(250), nullable=True, index=True)
+    reset_token_expires_at = Column(DateTime, nullable=True, index=True)
+
+
+class UserSession(Base):
+    """Defines a login session of a user; a user may have several"""
+    __tablename__ = 'sessions'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'),
+                     nullable=False, index=True)
+    session_id = Column(String(250), nullable=False, unique=True,
+                        index=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)